@@ -51,6 +51,12 @@ class EnvVarConfig(BaseSettings):
 
     opencage_api_key: str
 
+    # Token-aware chunking of case text for chat
+    chunk_encoding: str = "o200k_base"
+    chat_chunk_tokens: int = 3000
+    chat_chunk_overlap_tokens: int = 150
+    chat_map_concurrency: int = 8
+
     class EnvVarConfig:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -3,7 +3,8 @@ import azure.functions as func
 import json
 from config import get_config
 from services.storage import upload_user_file
-from services.rag import search_documents, generate_response
+from services.rag import search_documents, generate_response, generate_chunked_response
+from helpers.chunking import chunk_by_tokens
 from langchain.prompts import ChatPromptTemplate
 from typing import Optional
 from uuid import uuid4
@@ -95,13 +96,19 @@ async def chatbot(req: func.HttpRequest) -> func.HttpResponse:
             if case_summary_doc:
                 combined_doc = (case_summary_doc.get("document_content") or "") + "\n" + \
                                (case_summary_doc.get("supporting_document_content") or "")
-                documents = [combined_doc]
+                chunks = chunk_by_tokens(
+                    combined_doc,
+                    config.env.chat_chunk_tokens,
+                    config.env.chat_chunk_overlap_tokens,
+                    config.env.chunk_encoding
+                )
+                final_response = generate_chunked_response(query, chunks) if chunks else "No relevant case information found."
             else:
                 documents = search_documents(query)
+                final_response = generate_response(query, documents) if documents else "No relevant case information found."
         else:
             documents = search_documents(query)
-
-        final_response = generate_response(query, documents) if documents else "No relevant case information found."
+            final_response = generate_response(query, documents) if documents else "No relevant case information found."
 
         chat_doc = {
             "query": {"role": "user", "content": query},
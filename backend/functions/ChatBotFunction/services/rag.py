@@ -128,20 +128,24 @@ def search_documents(query: str):
     return documents if documents else None
 
 
-def generate_response(query, documents):
+def build_prompt(query, documents):
     document_string = "\n".join(documents)
-    prompt = f"""
+    return f"""
     With the following context and documents provided:
     {document_string}
     answer the query:
     {query}
     """
 
+
+def generate_response(query, documents):
+    prompt = build_prompt(query, documents)
+
     # Initialize communication with the Azure OpenAI model
     try:
         # Format prompt for the model
         with get_openai_callback() as cb:
-            output = config.llm.invoke(prompt)
+            output = config.langchain_llm.invoke(prompt)
             ret = output.content.strip()
     except Exception as e:
         raise Exception(f"Error during prompt classification: {str(e)}")
@@ -149,6 +153,29 @@ def generate_response(query, documents):
     return ret
 
 
+def generate_chunked_response(query, chunks):
+    """
+    Answer the query against each chunk in parallel, then merge the partial answers.
+
+    :param query: The user query.
+    :param chunks: Token-sized chunks of the case text.
+    :return: The merged response.
+    """
+    if len(chunks) == 1:
+        return generate_response(query, chunks)
+
+    try:
+        outputs = config.langchain_llm.batch(
+            [build_prompt(query, [chunk]) for chunk in chunks],
+            config={"max_concurrency": config.env.chat_map_concurrency}
+        )
+    except Exception as e:
+        raise Exception(f"Error during chunked response generation: {str(e)}")
+
+    answers = [output.content.strip() for output in outputs]
+    return generate_response(query, answers)
+
+
 def process_query(query: str):
     """
     Process the user query by searching for relevant documents and generating a response.
@@ -3,6 +3,8 @@ import logging
 import datetime
 from urllib.parse import urlparse
 import azure.functions as func
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
 from azure.storage.blob.aio import BlobServiceClient
 from motor.motor_asyncio import AsyncIOMotorClient
 
@@ -10,6 +12,8 @@ MONGO_URI = os.environ["MONGO_URI"]
 MONGO_DB = os.environ["MONGO_DB"]
 CASE_DETAILS_COLLECTION = "case_details"
 CASE_SUMMARY_COLLECTION = "case_summary"
+CASE_CHUNKS_COLLECTION = "case_chunks"
+UPLOAD_REFERENCES_COLLECTION = "upload_references"
 BLOB_CONNECTION_STRING = os.environ["BLOB_CONNECTION_STRING"]
 BLOB_CONTAINER_NAME = os.environ["BLOB_CONTAINER_NAME"]
 ANONYMOUS_USER_ID = os.environ["ANONYMOUS_USER_ID"]
@@ -17,7 +21,7 @@ ANONYMOUS_USER_ID = os.environ["ANONYMOUS_USER_ID"]
 
 def extract_blob_name(blob_url: str) -> str:
     try:
-        return urlparse(blob_url).path.lstrip(f'/{BLOB_CONTAINER_NAME}/')
+        return urlparse(blob_url).path.removeprefix(f'/{BLOB_CONTAINER_NAME}/')
     except Exception as e:
         logging.error(f"Error parsing blob URL '{blob_url}': {e}")
         return None
@@ -27,6 +31,8 @@ async def delete_old_entries():
     db = mongo_client[MONGO_DB]
     details_col = db[CASE_DETAILS_COLLECTION]
     summary_col = db[CASE_SUMMARY_COLLECTION]
+    chunks_col = db[CASE_CHUNKS_COLLECTION]
+    references_col = db[UPLOAD_REFERENCES_COLLECTION]
 
     blob_service_client = BlobServiceClient.from_connection_string(BLOB_CONNECTION_STRING)
     container_client = blob_service_client.get_container_client(BLOB_CONTAINER_NAME)
@@ -50,18 +56,36 @@ async def delete_old_entries():
             if "supporting_documents" in summary:
                 blob_urls.extend(summary.get("supporting_documents", []))
 
+            # Blobs are stored by content digest and may be shared with other cases
+            await references_col.delete_many({"case_id": str(case_id)})
+
             for blob_url in blob_urls:
                 blob_name = extract_blob_name(blob_url)
-                if blob_name:
-                    try:
-                        await container_client.delete_blob(blob_name)
-                        logging.info(f"Deleted blob: {blob_name}")
-                    except Exception as e:
-                        logging.warning(f"Could not delete blob '{blob_name}': {e}")
+                if not blob_name:
+                    continue
+                blob_client = container_client.get_blob_client(blob_name)
+                try:
+                    # Read the ETag before counting references: an upload that reuses the blob afterwards
+                    # rewrites its metadata, which makes the conditional delete below fail
+                    properties = await blob_client.get_blob_properties()
+                except ResourceNotFoundError:
+                    continue
+                if await references_col.count_documents({"blob_name": blob_name}, limit=1):
+                    logging.info(f"Keeping shared blob: {blob_name}")
+                    continue
+                try:
+                    await blob_client.delete_blob(etag=properties.etag, match_condition=MatchConditions.IfNotModified)
+                    logging.info(f"Deleted blob: {blob_name}")
+                except ResourceModifiedError:
+                    logging.info(f"Keeping blob reused by a concurrent upload: {blob_name}")
+                except Exception as e:
+                    logging.warning(f"Could not delete blob '{blob_name}': {e}")
 
             await summary_col.delete_one({"_id": summary["_id"]})
             logging.info(f"Deleted case_summary with case_id: {case_id}")
 
+        await chunks_col.delete_many({"case_id": str(case_id)})
+
     await mongo_client.close()
 
 async def main(mytimer: func.TimerRequest) -> None:
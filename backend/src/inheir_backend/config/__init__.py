@@ -12,14 +12,15 @@ from ..helpers.service import get_storage_client
 from ..helpers.service import get_llm
 from ..helpers.service import get_search
 from ..helpers.service import get_langchain_llm
+from ..helpers.service import get_langchain_embeddings
 
-from azure.storage.blob import ContainerClient
-from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.storage.blob.aio import ContainerClient
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
-from langchain_openai import AzureChatOpenAI
-from azure.search.documents import SearchClient
-from openai import AzureOpenAI
-from azure.ai.textanalytics import TextAnalyticsClient
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from azure.search.documents.aio import SearchClient
+from openai import AsyncAzureOpenAI
+from azure.ai.textanalytics.aio import TextAnalyticsClient
 
 load_dotenv()
 
@@ -49,8 +50,16 @@ class AppConfig:
             self.env.azure_openai_api_version
         )
 
+        # Embedding model for the per-case chunk index
+        self.embeddings: AzureOpenAIEmbeddings = get_langchain_embeddings(
+            self.env.azure_openai_api_key,
+            self.env.azure_openai_endpoint,
+            self.env.azure_openai_embedding_deployment,
+            self.env.azure_openai_api_version
+        )
+
         # Normal LLM for working
-        self.llm: AzureOpenAI = get_llm(
+        self.llm: AsyncAzureOpenAI = get_llm(
             self.env.azure_openai_api_key,
             self.env.azure_openai_endpoint,
             self.env.azure_openai_api_version
@@ -63,6 +72,17 @@ class AppConfig:
         # Text Analytics Client
         self.text_analytics_client: TextAnalyticsClient = get_text_analysis_client(self.env.document_intelligence_endpoint, self.env.document_intelligence_key)
 
+    async def close(self):
+        """
+        Close the async Azure and OpenAI clients and their connection pools.
+        """
+        await self.knowledge_base.close()
+        await self.uploads.close()
+        await self.document_analysis_client.close()
+        await self.search.close()
+        await self.text_analytics_client.close()
+        await self.llm.close()
+
 
 def get_config() -> AppConfig:
     return AppConfig()
\ No newline at end of file
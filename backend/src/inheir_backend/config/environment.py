@@ -1,3 +1,4 @@
+from typing import Optional
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from ..helpers.singleton import singleton
@@ -45,12 +46,126 @@ class EnvVarConfig(BaseSettings):
     azure_openai_deployment: str
     azure_openai_api_version: str
     azure_openai_model_name: str    
+    azure_openai_embedding_deployment: str = "text-embedding-3-small"
     
     # Anonymous usage
     anonymous_user_id: str
 
     opencage_api_key: str
 
+    # Geocoding: request timeout, attempts, and cache lifetime of found and unmatched addresses
+    geocode_timeout_seconds: float = 10
+    geocode_retries: int = 3
+    geocode_cache_ttl_seconds: int = 30 * 24 * 3600
+    geocode_negative_ttl_seconds: int = 3600
+    geocode_cache_local_entries: int = 4096
+    # Deadline shared by the geocoding and the LLM analysis of a location
+    gis_analyze_timeout_seconds: float = 20
+    # Complete location analyses reused by normalized address
+    gis_analysis_ttl_seconds: int = 7 * 24 * 3600
+    gis_analysis_cache_entries: int = 1024
+    gis_analysis_cache_local_ttl_seconds: int = 3600
+    # Reuse of the nearest analysis within a radius (0 disables) and freshness window
+    gis_reuse_radius_meters: float = 100
+    gis_reuse_max_age_seconds: int = 24 * 3600
+    # Local geospatial layers (GeoPackage or GeoParquet) for deterministic scoring; unset layers are skipped
+    gis_flood_layer_path: Optional[str] = None
+    gis_amenity_layer_path: Optional[str] = None
+    gis_transit_layer_path: Optional[str] = None
+    gis_zone_layer_path: Optional[str] = None
+    gis_coverage_layer_path: Optional[str] = None
+    gis_amenity_radius_meters: float = 1000
+    gis_amenity_target_count: int = 20
+    gis_transit_radius_meters: float = 800
+    # Batch location analysis: maximum addresses per request and addresses analyzed in parallel
+    gis_batch_max_addresses: int = 1000
+    gis_batch_concurrency: int = 8
+
+    # Document processing concurrency
+    case_document_concurrency: int = 4
+    document_processing_concurrency: int = 16
+
+    # Asynchronous case creation jobs ("mongo" or "memory" queue)
+    case_job_queue: str = "mongo"
+    case_job_workers: int = 2
+    case_job_lease_seconds: int = 300
+    case_job_max_attempts: int = 3
+
+    # Case summarization: "single" structured-output call or "multi" sequential calls
+    case_summary_mode: str = "single"
+
+    # Entity extraction: characters per chunk, chunks per request and parallel requests
+    entity_chunk_chars: int = 5000
+    entity_batch_size: int = 5
+    entity_actions_batch_size: int = 25
+    entity_concurrency: int = 4
+    # Request PII, entities and key phrases in one analyze-actions round-trip
+    entity_multi_action: bool = False
+
+    # Token-aware chunking: tiktoken encoding of the chat model
+    chunk_encoding: str = "o200k_base"
+
+    # Case chat map-reduce: tokens per chunk, overlap, parallel chunk calls and maximum chunk calls per request
+    chat_chunk_tokens: int = 3000
+    chat_chunk_overlap_tokens: int = 150
+    chat_map_concurrency: int = 8
+    chat_map_max_chunks: int = 16
+
+    # Per-case chunk embedding index: "numpy" searches in process, "atlas" uses MongoDB Atlas vector search
+    case_chunk_tokens: int = 400
+    case_chunk_overlap_tokens: int = 50
+    case_chunk_top_k: int = 4
+    case_vector_search: str = "numpy"
+    case_vector_index_name: str = "case_chunks_vector_index"
+    query_embedding_cache_size: int = 1024
+    case_vector_cache_size: int = 64
+    case_vector_cache_ttl_seconds: int = 300
+
+    # Case chat memory: turns kept verbatim and length of the rolling summary of older turns
+    chat_memory_enabled: bool = True
+    chat_memory_turns: int = 6
+    chat_memory_summary_words: int = 250
+
+    # Chatbot response cache: shared Mongo tier and in-process tier
+    response_cache_enabled: bool = True
+    response_cache_ttl_seconds: int = 86400
+    response_cache_max_entries: int = 50000
+    response_cache_local_entries: int = 1024
+    response_cache_local_ttl_seconds: int = 300
+
+    # Knowledge base ingestion into Azure AI Search
+    kb_chunk_tokens: int = 800
+    kb_chunk_overlap_tokens: int = 100
+    kb_ingestion_page_size: int = 100
+    kb_ingestion_concurrency: int = 8
+    kb_search_batch_size: int = 1000
+    kb_search_batch_bytes: int = 15 * 1024 * 1024
+    kb_search_upload_concurrency: int = 2
+    kb_search_upload_retries: int = 3
+
+    # Knowledge base retrieval: "remote" (Azure AI Search, local BM25 fallback) or "local" (in-process BM25)
+    kb_retriever: str = "remote"
+    kb_local_fallback: bool = True
+    kb_local_refresh_seconds: int = 300
+    kb_search_top: int = 3
+
+    # Streaming uploads
+    upload_max_bytes: int = 100 * 1024 * 1024
+    upload_block_bytes: int = 4 * 1024 * 1024
+
+    # Local text-layer extraction for born-digital PDFs
+    text_layer_enabled: bool = True
+    text_layer_min_chars: int = 20
+
+    # Page-range parallel OCR for large scanned documents
+    ocr_range_pages: int = 20
+    ocr_range_concurrency: int = 4
+    ocr_range_retries: int = 2
+
+    # Extraction cache in front of Document Intelligence
+    extraction_cache_max_entries: int = 10000
+    extraction_cache_max_entry_bytes: int = 4000000
+
     class EnvVarConfig:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,134 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+token_pattern = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return token_pattern.findall(text.casefold())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring.
+
+    Documents are added and removed incrementally; postings are compacted into CSR arrays
+    (term offsets, document ids, term frequencies) the next time the index is searched.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.contents: List[str] = []
+        self.doc_ids: Dict[str, int] = {}
+        self.doc_terms: List[np.ndarray] = []
+        self.doc_frequencies: List[np.ndarray] = []
+        self.doc_lengths: List[int] = []
+        self.removed = 0
+        self.dirty = True
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, key: str, content: str):
+        """
+        Add a document, replacing any document with the same key.
+        """
+        doc_id = self.doc_ids.get(key)
+        if doc_id is not None and self.contents[doc_id] == content:
+            return
+        self.remove(key)
+        term_ids = [self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokenize(content)]
+        terms, frequencies = np.unique(np.asarray(term_ids, dtype=np.int32), return_counts=True)
+        self.doc_ids[key] = len(self.keys)
+        self.keys.append(key)
+        self.contents.append(content)
+        self.doc_terms.append(terms.astype(np.int32))
+        self.doc_frequencies.append(frequencies.astype(np.int32))
+        self.doc_lengths.append(len(term_ids))
+        self.dirty = True
+
+    def add_many(self, documents: Iterable[Tuple[str, str]]):
+        for key, content in documents:
+            self.add(key, content)
+
+    def remove(self, key: str):
+        doc_id = self.doc_ids.pop(key, None)
+        if doc_id is None:
+            return
+        # Slots of removed documents are emptied now and reclaimed when too many accumulate
+        self.contents[doc_id] = ""
+        self.doc_terms[doc_id] = np.empty(0, dtype=np.int32)
+        self.doc_frequencies[doc_id] = np.empty(0, dtype=np.int32)
+        self.doc_lengths[doc_id] = 0
+        self.removed += 1
+        self.dirty = True
+        if self.removed > len(self.keys) // 2:
+            self.compact()
+
+    def compact(self):
+        live = sorted(self.doc_ids.values())
+        self.keys = [self.keys[doc_id] for doc_id in live]
+        self.contents = [self.contents[doc_id] for doc_id in live]
+        self.doc_terms = [self.doc_terms[doc_id] for doc_id in live]
+        self.doc_frequencies = [self.doc_frequencies[doc_id] for doc_id in live]
+        self.doc_lengths = [self.doc_lengths[doc_id] for doc_id in live]
+        self.doc_ids = {key: doc_id for doc_id, key in enumerate(self.keys)}
+        self.removed = 0
+        self.dirty = True
+
+    def build(self):
+        """
+        Compact the postings into CSR arrays sorted by term and precompute IDF weights.
+        """
+        counts = np.asarray([len(terms) for terms in self.doc_terms], dtype=np.int64)
+        if counts.sum():
+            terms = np.concatenate(self.doc_terms)
+            frequencies = np.concatenate(self.doc_frequencies)
+        else:
+            terms = np.empty(0, dtype=np.int32)
+            frequencies = np.empty(0, dtype=np.int32)
+        docs = np.repeat(np.arange(len(self.doc_terms), dtype=np.int32), counts)
+
+        order = np.argsort(terms, kind="stable")
+        self.posting_docs = docs[order]
+        self.posting_frequencies = frequencies[order].astype(np.float32)
+        document_frequencies = np.bincount(terms, minlength=len(self.vocabulary))
+        self.term_offsets = np.concatenate(([0], np.cumsum(document_frequencies))).astype(np.int64)
+
+        total = len(self.doc_ids)
+        self.idf = np.log1p((total - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(np.float32)
+        self.lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+        average_length = self.lengths.sum() / total if total else 1.0
+        self.length_norm = self.k1 * (1 - self.b + self.b * self.lengths / max(average_length, 1e-9))
+        self.dirty = False
+
+    def search(self, query: str, k: int) -> List[Tuple[str, str, float]]:
+        """
+        :param query: Free-text query.
+        :param k: Maximum number of results.
+        :return: (key, content, score) of the best matching documents, best first.
+        """
+        if not self.doc_ids:
+            return []
+        if self.dirty:
+            self.build()
+
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.posting_docs[start:end]
+            frequencies = self.posting_frequencies[start:end]
+            scores[docs] += self.idf[term_id] * frequencies * (self.k1 + 1) / (frequencies + self.length_norm[docs])
+
+        matched = np.flatnonzero(scores > 0)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[doc_id], self.contents[doc_id], float(scores[doc_id])) for doc_id in top]
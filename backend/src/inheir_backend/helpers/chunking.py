@@ -0,0 +1,148 @@
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import tiktoken
+
+DEFAULT_ENCODING = "o200k_base"
+
+# Token estimate used when the tokenizer files cannot be loaded
+CHARS_PER_TOKEN = 4
+
+# Chunks are only cut after a sentence end or at a line break
+boundary = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str) -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logging.warning(f"Could not load tokenizer {encoding_name}, estimating tokens from characters: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def split_units(text: str) -> List[str]:
+    """
+    Split text into sentences and lines, keeping the trailing whitespace of each
+    so that joining the units gives back the original text.
+    """
+    units = []
+    start = 0
+    for match in boundary.finditer(text):
+        units.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        units.append(text[start:])
+    return units
+
+
+def split_long_unit(unit: str, max_tokens: int, encoding: Optional[tiktoken.Encoding]) -> List[Tuple[str, int]]:
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        pieces = []
+        while len(unit) > size:
+            cut = unit.rfind(" ", 0, size)
+            cut = cut if cut > 0 else size
+            pieces.append(unit[:cut])
+            unit = unit[cut:]
+        pieces.append(unit)
+        return [(piece, math.ceil(len(piece) / CHARS_PER_TOKEN)) for piece in pieces]
+    tokens = encoding.encode_ordinary(unit)
+    return [
+        (encoding.decode(tokens[i:i + max_tokens]), len(tokens[i:i + max_tokens]))
+        for i in range(0, len(tokens), max_tokens)
+    ]
+
+
+def chunk_by_tokens(
+    text: str,
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    encoding_name: str = DEFAULT_ENCODING
+) -> List[str]:
+    """
+    Split text into chunks of at most `max_tokens` tokens, cutting only at sentence ends and line breaks.
+    Each chunk starts with the trailing sentences of the previous chunk, up to `overlap_tokens` tokens.
+    Sentences longer than `max_tokens` are split on token boundaries.
+
+    :param text: Text to split.
+    :param max_tokens: Token budget per chunk.
+    :param overlap_tokens: Token budget of the overlap between consecutive chunks.
+    :param encoding_name: tiktoken encoding of the target model.
+    :return: List of non-empty chunks.
+    """
+    encoding = get_encoding(encoding_name)
+    units = split_units(text)
+    if encoding is None:
+        lengths = [math.ceil(len(unit) / CHARS_PER_TOKEN) for unit in units]
+    else:
+        lengths = [len(tokens) for tokens in encoding.encode_ordinary_batch(units)]
+
+    sized = []
+    for unit, length in zip(units, lengths):
+        if length > max_tokens:
+            sized.extend(split_long_unit(unit, max_tokens, encoding))
+        else:
+            sized.append((unit, length))
+
+    chunks = []
+    current: List[Tuple[str, int]] = []
+    current_tokens = 0
+    for unit, length in sized:
+        if current and current_tokens + length > max_tokens:
+            chunks.append("".join(part for part, _ in current))
+            overlap: List[Tuple[str, int]] = []
+            overlap_used = 0
+            for part, part_length in reversed(current):
+                if overlap_used + part_length > overlap_tokens:
+                    break
+                overlap.append((part, part_length))
+                overlap_used += part_length
+            current = overlap[::-1]
+            current_tokens = overlap_used
+            while current and current_tokens + length > max_tokens:
+                current_tokens -= current.pop(0)[1]
+        current.append((unit, length))
+        current_tokens += length
+    if current:
+        chunks.append("".join(part for part, _ in current))
+
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def chunk_by_tokens_capped(
+    text: str,
+    max_tokens: int,
+    max_chunks: int,
+    overlap_tokens: int = 0,
+    encoding_name: str = DEFAULT_ENCODING
+) -> Tuple[List[str], int]:
+    """
+    Split text like `chunk_by_tokens` into at most `max_chunks` chunks, enlarging the token budget of each chunk
+    beyond `max_tokens` when the text needs it.
+
+    :param text: Text to split.
+    :param max_tokens: Minimum token budget per chunk.
+    :param max_chunks: Maximum number of chunks.
+    :param overlap_tokens: Token budget of the overlap between consecutive chunks.
+    :param encoding_name: tiktoken encoding of the target model.
+    :return: Chunks and the token budget per chunk they were cut with.
+    """
+    # The overlaps repeat up to `overlap_tokens` tokens in every chunk after the first
+    needed = count_tokens(text, encoding_name) + overlap_tokens * (max_chunks - 1)
+    budget = max(max_tokens, math.ceil(needed / max_chunks))
+    while True:
+        chunks = chunk_by_tokens(text, budget, overlap_tokens, encoding_name)
+        if len(chunks) <= max_chunks:
+            return chunks, budget
+        # Cuts at sentence ends leave chunks short of the budget; grow it by the excess
+        budget = max(budget + 1, math.ceil(budget * len(chunks) / max_chunks))
@@ -0,0 +1,33 @@
+import asyncio
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+
+async def gather_bounded(
+    items: Iterable[Any],
+    func: Callable[[Any], Awaitable[Any]],
+    limit: int,
+    shared_semaphore: Optional[asyncio.Semaphore] = None
+) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Run `func` over every item concurrently, with at most `limit` calls in flight.
+
+    :param items: Items to process.
+    :param func: Coroutine function applied to each item.
+    :param limit: Maximum number of concurrent calls for this fan-out.
+    :param shared_semaphore: Optional semaphore shared across fan-outs (process-wide cap).
+    :return: List of (result, error) tuples in the same order as `items`.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: Any) -> Tuple[Any, Optional[Exception]]:
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(semaphore)
+            if shared_semaphore is not None:
+                await stack.enter_async_context(shared_semaphore)
+            try:
+                return (await func(item), None)
+            except Exception as e:
+                return (None, e)
+
+    return await asyncio.gather(*(run(item) for item in items))
@@ -16,4 +16,17 @@ def get_filename_hash(file_name: str, hash_algorithm='sha256', file_extension=""
     file_extension = os.path.splitext(file_name)[1]
 
     hex_digest = hash_func.hexdigest()
-    return (f"{hex_digest}{file_extension}", hex_digest)
\ No newline at end of file
+    return (f"{hex_digest}{file_extension}", hex_digest)
+
+
+def get_content_hash(content: bytes, hash_algorithm='sha256'):
+    """
+    Function to calculate the hash value of the file content using a given hash algorithm (default is SHA-256).
+
+    :param content: The file content.
+    :param hash_algorithm: The hash algorithm to use ('sha256', 'md5', etc.)
+    :return: The hex digest of the file content.
+    """
+    hash_func = hashlib.new(hash_algorithm)
+    hash_func.update(content)
+    return hash_func.hexdigest()
@@ -1,10 +1,10 @@
-from azure.storage.blob import BlobServiceClient, ContainerClient
-from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.storage.blob.aio import BlobServiceClient, ContainerClient
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
-from langchain_openai import AzureChatOpenAI
-from azure.search.documents import SearchClient
-from openai import AzureOpenAI
-from azure.ai.textanalytics import TextAnalyticsClient
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from azure.search.documents.aio import SearchClient
+from openai import AsyncAzureOpenAI
+from azure.ai.textanalytics.aio import TextAnalyticsClient
 
 def get_document_analysis_client(form_recognizer_endpoint: str, form_recognizer_key: str) -> DocumentAnalysisClient:
     document_analysis_client = DocumentAnalysisClient(
@@ -36,8 +36,19 @@ def get_langchain_llm(openai_api_key: str, endpoint: str, deployment: str, api_v
     return llm
 
 
-def get_llm(openai_api_key: str, endpoint: str, api_version: str) -> AzureOpenAI:
-    llm = AzureOpenAI(
+def get_langchain_embeddings(openai_api_key: str, endpoint: str, deployment: str, api_version: str) -> AzureOpenAIEmbeddings:
+    embeddings = AzureOpenAIEmbeddings(
+        openai_api_key=openai_api_key,
+        azure_endpoint=endpoint,
+        azure_deployment=deployment,
+        api_version=api_version,
+        max_retries=2,
+    )
+    return embeddings
+
+
+def get_llm(openai_api_key: str, endpoint: str, api_version: str) -> AsyncAzureOpenAI:
+    llm = AsyncAzureOpenAI(
         api_key=openai_api_key,
         azure_endpoint=endpoint,
         api_version=api_version
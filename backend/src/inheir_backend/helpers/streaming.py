@@ -0,0 +1,20 @@
+import json
+
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+
+def format_event(event: dict, stream_format: str) -> str:
+    """
+    Encode an event as a server-sent event or as a newline-delimited JSON line.
+
+    :param event: Event with a "type" key.
+    :param stream_format: "sse" or "ndjson".
+    :return: Encoded event.
+    """
+    data = json.dumps(event, default=str)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
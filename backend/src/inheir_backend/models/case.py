@@ -11,7 +11,7 @@ config: AppConfig = get_config()
 class CaseDetails(BaseModel):
     title: str = "Case"
     user_id: str = config.env.anonymous_user_id
-    status: str = "Open" # Open | Resolved | Aborted
+    status: str = "Open" # Open | Processing | Failed | Resolved | Aborted
     created_at: datetime = Field(default_factory=datetime.utcnow)
     model_config = ConfigDict(
         arbitrary_types_allowed=True,
@@ -43,8 +43,18 @@ class CaseMetaResponse(BaseModel):
     reason: Optional[str] = None
 
 
+class CaseJobStatus(BaseModel):
+    case_id: str
+    status: str
+    job_id: Optional[str] = None
+    stage: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+
 class ChatMetaResponse(BaseModel):
     chats: List[Chat]
+    next_before: Optional[str] = None
     status: str = "success"
     success: bool = True
     reason: Optional[str] = None
@@ -63,6 +73,18 @@ class Asset(BaseModel):
     net_worth: str | None = None
     coordinates: str | None = None
 
+class DocumentResult(BaseModel):
+    filename: Optional[str] = None
+    url: Optional[str] = None
+    content: Optional[str] = None
+    error: Optional[str] = None
+
+
+class DocumentError(BaseModel):
+    filename: Optional[str] = None
+    error: str
+
+
 class CaseSummary(BaseModel):
     case_id: str
     valid: bool = False
@@ -78,6 +100,20 @@ class CaseSummary(BaseModel):
     recommendations: List[str] = [""]
     references: Optional[List[str]]
     remarks: Optional[str] = None
+    supporting_document_errors: Optional[List[DocumentError]] = None
+    key_phrases: Optional[List[str]] = None
+    content_version: Optional[str] = None
+
+
+class CaseAnalysis(BaseModel):
+    # Structured output of the single-call case summarization; fields have no defaults
+    # so the JSON schema stays valid for strict structured outputs
+    summary: str
+    recommendations: List[str]
+    valid: bool
+    legitimate: bool
+    case_type: str
+    references: List[str]
 
 
 class Case(BaseModel):
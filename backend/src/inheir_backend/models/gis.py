@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+
+class LocationRequest(BaseModel):
+    address: str
+
+
+class BatchLocationRequest(BaseModel):
+    addresses: List[str]
+
+
+class Coordinates(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class GISResponse(BaseModel):
+    coordinates: Optional[Coordinates] = None
+    property_buying_risk: Optional[float] = None
+    property_renting_risk: Optional[float] = None
+    flood_risk: Optional[float] = None
+    crime_rate: Optional[float] = None
+    air_quality_index: Optional[float] = None
+    proximity_to_amenities: Optional[float] = None
+    transportation_score: Optional[float] = None
+    neighborhood_rating: Optional[float] = None
+    environmental_hazards: Optional[float] = None
+    economic_growth_potential: Optional[float] = None
+    # Set when the coordinates or the metrics did not arrive before the deadline
+    partial: bool = False
+    # Served from a stored analysis; distance and age are set when it is the analysis of a nearby location
+    cached: bool = False
+    reused_distance_m: Optional[float] = None
+    reused_age_seconds: Optional[float] = None
+    # "layers" for metrics computed from local geospatial layers, "llm" for estimated ones
+    source: Literal["llm", "layers"] = "llm"
+
+
+METRIC_FIELDS = [
+    "property_buying_risk",
+    "property_renting_risk",
+    "flood_risk",
+    "crime_rate",
+    "air_quality_index",
+    "proximity_to_amenities",
+    "transportation_score",
+    "neighborhood_rating",
+    "environmental_hazards",
+    "economic_growth_potential"
+]
@@ -1,66 +1,25 @@
-import json
 import logging
 from datetime import datetime
-from fastapi import APIRouter, Request, UploadFile, Body
+from fastapi import APIRouter, Request, UploadFile, Body, Query
 from fastapi.responses import JSONResponse
 from ..config import AppConfig, get_config
 from ..models.case import CaseDetails, CaseSummary, CaseMetaResponse
-from ..models.case import CaseResponse, Case, Remarks, ChatMetaResponse
-from ..models.chat import Chat, ChatData
+from ..models.case import CaseResponse, Case, Remarks, ChatMetaResponse, CaseJobStatus
+from ..models.chat import Chat
 from typing import Optional, List
-from ..services.rag import process_upload_document
-from ..services.storage import upload_user_file, upload_knowledge_base_file
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain.chains.llm import LLMChain
+from ..services.documents import process_case_documents, upload_case_documents
+from ..services.case import analyze_case
+from ..services.jobs import case_job_queue
 from ..helpers.serializer import serializer
 from fastapi import HTTPException
 from bson import ObjectId
+from pymongo import DESCENDING
 
 router = APIRouter(tags=["Case Analysis"])
 
 config: AppConfig = get_config()
 
 
-case_summary_system_template = """You are a legal assistant specialized in property and title resolution who generates insights on summary."""
-case_summary_user_template = """\
-### Documents summary:
-{{{{ document_summary }}}}
-
-{{{{
-  "valid": boolean, # should be only true or false
-  "legitimate": boolean, # should be only true or false
-  "case_type": string, # no null
-  "entity": [
-    {{
-      "name": string,
-      "entity_type": "person" | "organization",
-      "valid": boolean
-    }}
-  ],
-  "asset": [
-    {{
-      "name": string,
-      "location": string | null,
-      "asset_type": string,
-      "net_worth": string | null,
-      "coordinates": string | null
-    }}
-  ],
-  "references": [ string ]
-}}}}
-
-Guidelines:
-- Use plain English.
-- Use null if information is missing.
-- Return ONLY JSON, without any formatting. No surrounding text, no markdown.
-"""
-
-case_summary_prompt_template = ChatPromptTemplate.from_messages([
-    SystemMessagePromptTemplate.from_template(case_summary_system_template),
-    HumanMessagePromptTemplate.from_template(case_summary_user_template)
-])
-
-
 @router.get("/is_admin")
 async def is_admin(req: Request):
     user = req.state.user
@@ -79,132 +38,70 @@ async def create_case(
     document: UploadFile,
     supporting_documents: Optional[List[UploadFile]] = None,
     title: Optional[str] = "Title",
-    address: Optional[str] = None
+    address: Optional[str] = None,
+    background: bool = False
 ):
     user_id = config.env.anonymous_user_id
     if req.state.user:
         user_id = req.state.user.get("user_id")
     case_details_collection = config.db['case_details']
-    case_summary_collection = config.db['case_summary']
     date = str(datetime.now())
     case_details = {"user_id": user_id, "title": title or f"Case - {date}"}
+    if background:
+        case_details["status"] = "Processing"
     case_details = CaseDetails(**case_details)
     case_insert_result = await case_details_collection.insert_one(case_details.dict())
     case_id = case_insert_result.inserted_id
     case_id = str(case_id)
 
-    user_document = await upload_user_file(document, user_id=user_id, case_id=case_id, chat_id=None, case=True)
-    document_url = user_document.get("url")
+    files = [document, *(supporting_documents or [])]
+
+    if background:
+        documents = await upload_case_documents(files, user_id, case_id)
+        if documents[0].url is None:
+            await case_details_collection.update_one(
+                {"_id": ObjectId(case_id)}, {"$set": {"status": "Failed"}})
+            return JSONResponse(
+                status_code=422,
+                content={
+                    "status": "failed",
+                    "success": False,
+                    "reason": f"Invalid document. {documents[0].error}"
+                }
+            )
+        job_id = await case_job_queue.enqueue(
+            "case_create",
+            {
+                "case_id": case_id,
+                "user_id": user_id,
+                "documents": [document.model_dump() for document in documents]
+            },
+            case_id=case_id
+        )
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "accepted",
+                "success": True,
+                "case_id": case_id,
+                "job_id": job_id
+            }
+        )
 
-    supporting_documents_urls = []
-    if supporting_documents is not None:
-        for supporting_document in supporting_documents:
-            user_supporting_document = await upload_user_file(supporting_document, user_id=user_id, case_id=case_id, chat_id=None, case=True)
-            supporting_document_url = user_supporting_document.get("url")
-            supporting_documents_urls.append(supporting_document_url)
-    
-    document_content = process_upload_document(document_url)
-    if document_content is None:
+    documents = await process_case_documents(files, user_id, case_id)
+    main_document = documents[0]
+    if main_document.content is None:
         return JSONResponse(
             status_code=422,
             content={
                 "status": "failed",
                 "success": False,
-                "reason": "Invalid document. Document contains no readable text."
+                "reason": f"Invalid document. {main_document.error}"
             }
         )
-    document_content = document_content.strip()
-    persons = []
-    properties = []
-
-    try:
-        text_analytics_client = config.text_analytics_client
-        pii_result = text_analytics_client.recognize_pii_entities([document_content])
-        pii_result = pii_result[0]
-        if not pii_result.is_error:
-            for entity in pii_result.entities:
-                if entity.category == "Person":
-                    item = {
-                        "name": entity.text,
-                        "valid": True,
-                        "entity_type": "person"
-                    }
-                    persons.append(item)
-                elif entity.category in ["Organization", "Address", "Location"]:
-                    item = {
-                        "name": entity.text,
-                        "location": entity.text,
-                        "asset_type": entity.category,
-                        "coordinates": None,
-                        "net_worth": None
-                    }
-                    properties.append(item)
-        else:
-            logging.warning(f"PII extraction error: {pii_result.error}")
-    except Exception as e:
-        logging.error(f"Azure PII detection failed: {e}")
 
-    supporting_document_content = []
-    for idx, supporting_doc_url in enumerate(supporting_documents_urls):
-        supporting_doc_content = process_upload_document(supporting_doc_url)
-        if supporting_doc_content is not None:
-            supporting_doc_content = str(0+1) + ". " + supporting_doc_content
-            supporting_document_content.append(supporting_doc_content.strip())
     try:
-        client = config.langchain_llm
-        llm = config.llm
-        document_summary = llm.chat.completions.create(
-            model=config.env.azure_openai_model_name,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant who summarizes cases based on given legal documents."},
-                {"role": "user", "content": f"### Document\n{document_content}\n###Supporting documents\n{"\n".join(supporting_document_content)}"}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
-        document_summary = document_summary.choices[0].message.content
-
-        recommendations = llm.chat.completions.create(
-            model=config.env.azure_openai_model_name,
-            messages=[
-               {"role": "system", "content": "You are a helpful assistant who summarizes cases based on given legal documents. Give only JSON list of strings, no object, no markdown, no formatting, no emoji, just content in string format in simple lay person English"},
-               {"role": "user", "content": f"Based on below summary\n {document_summary}\n provide clear, actionable insights on ownership and solving the dispute"}
-           ],
-           max_tokens=400,
-           temperature=0.7
-        )
-        recommendations = json.loads(recommendations.choices[0].message.content)
-        chain = LLMChain(
-            llm=client,
-            prompt=case_summary_prompt_template
-        )
-
-
-        logging.info("Executing chain")
-        chain_info = {
-            "document_summary": document_summary
-        }
-
-        response = chain.invoke(chain_info)
-        case_summ_dict = json.loads(response.pop("text"))
-        case_summ_dict["case_id"] = case_id
-        case_summ_dict["document_content"] = document_content
-        case_summ_dict["supporting_document_content"] = "\n".join(supporting_document_content)
-        case_summ_dict["document"] = document_url
-        case_summ_dict["supporting_documents"] = supporting_documents_urls
-        case_summ_dict["entity"] = [dict(t) for t in {tuple(d.items()) for d in persons}]
-        case_summ_dict["asset"] = [dict(t) for t in {tuple(d.items()) for d in properties}]
-        case_summ_dict["recommendations"] = recommendations
-        case_summ_dict["summary"] = document_summary
-        case_summ_dict["valid"] = True
-        case_summ_dict["legitimate"] = True
-        
-        if case_type := case_summ_dict.get("case_type") is None:
-            case_summ_dict["case_type"] = "Dispute"
-        
-
-        case_summary = CaseSummary(**case_summ_dict)
-        case_summary_id = await case_summary_collection.insert_one(case_summ_dict)
+        case_summary = await analyze_case(case_id, documents)
         return JSONResponse(
             status_code=200,
             content=case_summary.dict()
@@ -212,7 +109,7 @@ async def create_case(
 
     except Exception as e:
         logging.error(e)
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}") 
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
 @router.get("/history", response_model=CaseMetaResponse)
@@ -306,6 +203,37 @@ async def get_summary(req: Request, case_id: str):
             content=case_response.model_dump()
         )
 
+@router.get("/{case_id}/status", response_model=CaseJobStatus)
+async def get_case_status(req: Request, case_id: str):
+    user_id = config.env.anonymous_user_id
+    if req.state.user:
+        user_id = req.state.user.get("user_id")
+    case_details_collection = config.db["case_details"]
+    case_doc = await case_details_collection.find_one(
+        {"user_id": user_id, "_id": ObjectId(case_id)},
+        {"status": 1}
+    )
+    if not case_doc:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "message": "Case not found"
+            }
+        )
+    job = await case_job_queue.find_by_case(case_id)
+    case_status = CaseJobStatus(
+        case_id=case_id,
+        status=case_doc.get("status"),
+        job_id=job.get("job_id") if job else None,
+        stage=job.get("stage") if job else None,
+        attempts=job.get("attempts", 0) if job else 0,
+        error=job.get("error") if job else None
+    )
+    return JSONResponse(
+        status_code=200,
+        content=case_status.model_dump()
+    )
+
 @router.post("/{case_id}/resolve")
 async def resolve_case(req: Request, case_id: str, remarks: Remarks = Body(default=Remarks())):
     user_id = None
@@ -377,7 +305,16 @@ async def abort_case(req: Request, case_id: str, remarks: Remarks = Body(default
         )
 
 @router.get("/{case_id}/chats", response_model=ChatMetaResponse)
-async def get_chats(req: Request, case_id: str):
+async def get_chats(
+    req: Request,
+    case_id: str,
+    limit: int = Query(default=50, ge=1, le=200),
+    before: Optional[str] = None
+):
+    """
+    Page through the chats of a case, newest page first. Chats within a page are in chronological order;
+    pass `next_before` from the response as `before` to fetch the previous page.
+    """
     if not req.state.user:
         return JSONResponse(
             status_code=401,
@@ -387,24 +324,35 @@ async def get_chats(req: Request, case_id: str):
                 "reason": "Please sign in."
             }
         )
+    if before is not None and not ObjectId.is_valid(before):
+        return JSONResponse(
+            status_code=400,
+            content={
+                "status": "failed",
+                "success": False,
+                "reason": "Invalid cursor."
+            }
+        )
     user_id = req.state.user.get("user_id")
-    case_details_collection = config.db["chat_history"]
-    cursor = case_details_collection.find(
-        {"user_id": user_id, "case_id": case_id}
-    )
+    chat_filter = {"user_id": user_id, "case_id": case_id}
+    if before is not None:
+        chat_filter["_id"] = {"$lt": ObjectId(before)}
+
+    chat_history_collection = config.db["chat_history"]
+    cursor = chat_history_collection.find(
+        chat_filter,
+        {"query": 1, "response": 1, "case_id": 1, "user_id": 1, "document": 1}
+    ).sort("_id", DESCENDING).limit(limit + 1)
+    docs = await cursor.to_list(length=limit + 1)
+
+    next_before = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
     chats = []
-    async for doc in cursor:
-        doc["_id"] = doc["_id"].__str__()
-        doc["chat_id"] = doc["_id"]
-        doc.pop("_id", None)
-        query = doc.pop("query")
-        doc["query"] = ChatData(**query)
-        response = doc.pop("response")
-        doc["response"] = ChatData(**response)
-        chats.append(Chat(**doc)) 
-    chats_dict = {"chats": chats}
+    for doc in reversed(docs[:limit]):
+        doc["chat_id"] = str(doc.pop("_id"))
+        doc.setdefault("document", None)
+        chats.append(Chat(**doc))
 
-    chat_response = ChatMetaResponse(**chats_dict)
+    chat_response = ChatMetaResponse(chats=chats, next_before=next_before)
     return JSONResponse(
         status_code=200,
         content={
@@ -1,68 +1,71 @@
-from fastapi import APIRouter, HTTPException, Request, UploadFile, Form, File
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, UploadFile, Form, File
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 import logging
-from openai import AzureOpenAI
 from ..config import AppConfig
-from ..services.rag import search_documents
+from ..services.case_index import case_chunk_index
+from ..services.response_cache import response_cache
+from ..services.extraction_cache import extraction_cache
+from ..services.text_layer import extraction_metrics
 from ..models.chat import Chat
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains.llm import LLMChain
-from langchain_core.output_parsers import StrOutputParser
-from operator import itemgetter
-from ..services.storage import upload_user_file
+from ..services.chat import PreparedAnswer, prepare_case_answer, prepare_law_answer, save_chat_history
+from ..services.memory import load_memory, update_memory
+from ..services.storage import upload_user_file, UploadTooLargeError
+from ..helpers.streaming import STREAM_MEDIA_TYPES, format_event
 
 config: AppConfig = AppConfig()
 
 router = APIRouter(tags=["Chatbot"])
 
 
-chatbot_case_template = """\
-You are a legal assistant analyzing a legal case document to answer a user query.
-
-Context:
-{chunk}
-
-User query:
-{query}
-
-Answer in plain English with clear reasoning.
-"""
-
-chatbot_law_template = """\
-You are a helpful legal assistant that answers a query with relevant law data \
-and worldwide legal regulations, policies and laws. If no data is provided, answer \
-using publicly available knowledge, especially by trying to understand the nationality behind the query \
-to answer based on that country's laws and regulations to maintain fairness. \
-Always aim to help the user as best as you can. Keep your responses concise and relevant.
-
-Here's the query:
-{{ query }}
-
-Guidelines:
-- Use plain English.
-- Give generic answers if needed.
-"""
+async def stream_chat(
+    req: Request,
+    answer: PreparedAnswer,
+    stream_format: str,
+    query: str,
+    case_id: Optional[str],
+    user_id: str,
+    document_url: Optional[str]
+):
+    """
+    Forward answer tokens as they are generated and store the chat turn once the answer completes.
+    Generation stops early, without storing the turn, if the client disconnects.
+    The conversation memory of a case chat is updated after the final event.
+    """
+    tokens = []
+    try:
+        async for token in answer.stream():
+            if await req.is_disconnected():
+                logging.info("Client disconnected, stopping chat generation")
+                return
+            tokens.append(token)
+            yield format_event({"type": "token", "content": token}, stream_format)
+
+        chat_history = await save_chat_history(query, "".join(tokens), case_id, user_id, document_url)
+        yield format_event({"type": "done", "chat": chat_history.model_dump()}, stream_format)
+        if case_id and config.env.chat_memory_enabled:
+            await update_memory(user_id, case_id)
 
-chatbot_case_prompt_template = ChatPromptTemplate.from_template(chatbot_case_template)
-chatbot_law_prompt_template = ChatPromptTemplate.from_template(chatbot_law_template)
+    except Exception as e:
+        logging.exception("Error occurred while streaming /chat response")
+        yield format_event({"type": "error", "detail": str(e)}, stream_format)
 
-def chunk_text(text: str, max_chunk_size: int = 1000):
-    return [text[i:i+max_chunk_size] for i in range(0, len(text), max_chunk_size)]
 
 @router.post("/chat", response_model=Chat)
 async def chat(
     req: Request,
+    background_tasks: BackgroundTasks,
     document: Optional[UploadFile] = File(default=None),
     query: str = Form(...),
     case_id: Optional[str] = Form(None),
+    stream: Optional[Literal["sse", "ndjson"]] = None,
 ):
-    user_id = config.env.anonymous_user_id 
+    user_id = config.env.anonymous_user_id
     if req.state.user:
         user_id = req.state.user.get("user_id")
 
     try:
-        client = config.langchain_llm
         document_url = None
 
         # Handle uploaded document
@@ -70,68 +73,63 @@ async def chat(
             user_document = await upload_user_file(document, user_id=user_id, case_id=case_id, chat_id=None, case=False)
             document_url = user_document.get("url")
 
-        search_results = search_documents(query)
-        logging.info(f"Search results content: {search_results}")
-
-        # If case_id is present, fetch and chunk the case content
+        # If case_id is present, answer from the case content
         if case_id:
             case_summary_collection = config.db["case_summary"]
             case_summary_doc = await case_summary_collection.find_one(
                 {"case_id": case_id},
-                {"document_content": 1, "supporting_document_content": 1}
+                {"case_id": 1, "content_version": 1, "document_content": 1, "supporting_document_content": 1}
             )
-
-            output_parser = StrOutputParser()
-            rag_prompt = ChatPromptTemplate.from_template(chatbot_case_template)
-
-            response_chunks = []
             if case_summary_doc:
-                combined_doc = (case_summary_doc.get("document_content") or "") + "\n" + \
-                               (case_summary_doc.get("supporting_document_content") or "")
-                chunks = chunk_text(combined_doc)
-
-                for chunk in chunks:
-                    rag_chain = (
-                        {
-                            "chunk": itemgetter("chunk"),
-                            "query": itemgetter("query"),
-                        }
-                        | rag_prompt
-                        | client
-                        | output_parser
-                    )
-                    result = rag_chain.invoke({"chunk": chunk, "query": query})
-                    response_chunks.append(result)
-
-            final_response = "\n\n".join(response_chunks) if response_chunks else "No relevant case information found."
+                memory = await load_memory(user_id, case_id) if config.env.chat_memory_enabled else None
+                answer = await prepare_case_answer(query, case_summary_doc, memory)
+            else:
+                answer = PreparedAnswer(text="No relevant case information found.")
 
         else:
-            chain = LLMChain(
-                llm=client,
-                prompt=chatbot_law_prompt_template
+            answer = await prepare_law_answer(query)
+
+        if stream:
+            return StreamingResponse(
+                stream_chat(req, answer, stream, query, case_id, user_id, document_url),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
             )
-            result = chain.invoke({"query": query})
-            final_response = result.get("text", "No response generated.")
-
-        chat_history_doc = {
-            "query": {
-                "role": "user",
-                "content": query
-            },
-            "response": {
-                "role": "bot",
-                "content": final_response
-            },
-            "case_id": case_id,
-            "user_id": user_id,
-            "document": document_url
-        }
-        chat_insert_result = await config.db["chat_history"].insert_one(chat_history_doc)
-        chat_history_doc["chat_id"] = str(chat_insert_result.inserted_id)
-        chat_history = Chat(**chat_history_doc)
 
+        final_response = await answer.invoke()
+        chat_history = await save_chat_history(query, final_response, case_id, user_id, document_url)
+        if case_id and config.env.chat_memory_enabled:
+            background_tasks.add_task(update_memory, user_id, case_id)
         return chat_history
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
     except Exception as e:
         logging.exception("Error occurred in /chat endpoint")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache_stats")
+async def cache_stats(req: Request):
+    user = req.state.user
+    if not user or user.get("role") != "Admin":
+        return JSONResponse(
+            status_code=403,
+            content={
+                "status": "failed",
+                "success": False,
+                "reason": "Admin access required."
+            }
+        )
+    return JSONResponse(
+        status_code=200,
+        content={
+            "responses": response_cache.stats(),
+            "query_embeddings": case_chunk_index.query_cache.stats(),
+            "extraction_cache": extraction_cache.stats(),
+            "text_extraction": extraction_metrics.stats(),
+            "status": "success",
+            "success": True
+        }
+    )
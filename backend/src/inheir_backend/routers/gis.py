@@ -1,118 +1,83 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
-import json
-import os
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List
+import asyncio
 import logging
-from openai import AzureOpenAI
 from ..config import AppConfig
-from geopy.geocoders import OpenCage
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-from tenacity import retry, stop_after_attempt, wait_exponential
+from ..helpers.streaming import STREAM_MEDIA_TYPES, format_event
+from ..models.gis import BatchLocationRequest, LocationRequest, GISResponse
+from ..services import gis
+from ..services.geocoding import normalize_address
 
 router = APIRouter(tags=["GIS Analysis"])
 
 config: AppConfig = AppConfig()
 
-class LocationRequest(BaseModel):
-    address: str
+@router.post("/analyze", response_model=GISResponse)
+async def analyze_location(request: LocationRequest) -> Dict[str, Any]:
+    try:
+        return await gis.analyze_address(request.address)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=f"Error analyzing location: {str(e)}")
+    except Exception as e:
+        logging.error(f"Error analyzing location: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error analyzing location: {str(e)}")
 
-class Coordinates(BaseModel):
-    latitude: float
-    longitude: float
 
-class GISResponse(BaseModel):
-    coordinates: Optional[Coordinates] = None
-    property_buying_risk: float
-    property_renting_risk: float
-    flood_risk: float
-    crime_rate: float
-    air_quality_index: float
-    proximity_to_amenities: float
-    transportation_score: float
-    neighborhood_rating: float
-    environmental_hazards: float
-    economic_growth_potential: float
+async def stream_batch(req: Request, addresses: List[str]):
+    """
+    Analyze the unique addresses of a batch, at most GIS_BATCH_CONCURRENCY at a time, and emit one NDJSON
+    event per unique address as soon as it finishes. Each event lists the request indexes it answers.
+    """
+    groups: Dict[str, List[int]] = {}
+    for idx, address in enumerate(addresses):
+        groups.setdefault(normalize_address(address), []).append(idx)
+    semaphore = asyncio.Semaphore(max(1, config.env.gis_batch_concurrency))
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    reraise=True
-)
-def get_coordinates(address: str) -> Optional[Coordinates]:
-    try:
-        # Initialize OpenCage geocoder with a longer timeout
-        geolocator = OpenCage(
-            api_key=config.env.opencage_api_key,
-            timeout=10
-        )
-        
-        # Geocode the address
-        location = geolocator.geocode(address)
-        
-        if location:
-            return Coordinates(
-                latitude=location.latitude,
-                longitude=location.longitude
-            )
-        return None
-    except (GeocoderTimedOut, GeocoderServiceError) as e:
-        logging.error(f"Geocoding error: {str(e)}")
-        raise  # Re-raise for retry
-    except Exception as e:
-        logging.error(f"Unexpected geocoding error: {str(e)}")
-        return None
+    async def run(key: str, indexes: List[int]) -> Dict[str, Any]:
+        address = addresses[indexes[0]]
+        event = {"address": address, "indexes": indexes}
+        try:
+            if not key:
+                raise ValueError("Address is empty")
+            async with semaphore:
+                result = await gis.analyze_address(address)
+            return {"type": "result", **event, "result": GISResponse(**result).model_dump()}
+        except Exception as e:
+            logging.error(f"Error analyzing location {address}: {str(e)}")
+            return {"type": "error", **event, "detail": str(e) or type(e).__name__}
 
-@router.post("/analyze", response_model=GISResponse)
-async def analyze_location(request: LocationRequest) -> Dict[str, Any]:
+    tasks = [asyncio.create_task(run(key, indexes)) for key, indexes in groups.items()]
+    counts = {"result": 0, "error": 0, "cached": 0}
     try:
-        # Get coordinates first
-        coordinates = get_coordinates(request.address)
-        
-        client = AzureOpenAI(
-            api_key=config.env.azure_openai_api_key,
-            api_version=config.env.azure_openai_api_version,
-            azure_endpoint=config.env.azure_openai_endpoint
-        )
+        for next_event in asyncio.as_completed(tasks):
+            event = await next_event
+            if await req.is_disconnected():
+                logging.info("Client disconnected, stopping batch location analysis")
+                return
+            counts[event["type"]] += 1
+            counts["cached"] += event["type"] == "result" and event["result"]["cached"]
+            yield format_event(event, "ndjson")
+        yield format_event({
+            "type": "done",
+            "addresses": len(addresses),
+            "unique": len(groups),
+            "succeeded": counts["result"],
+            "failed": counts["error"],
+            "cached": counts["cached"]
+        }, "ndjson")
+    finally:
+        for task in tasks:
+            task.cancel()
 
-        prompt = f"""Analyze the following address for real estate investment potential and return a JSON response with the following metrics:
-        Address: {request.address}
-        
-        Please provide a detailed analysis and return a JSON object with the following keys and their values (all values should be between 0 and 1):
-        - property_buying_risk (0-1, where 1 is highest risk)
-        - property_renting_risk (0-1, where 1 is highest risk)
-        - flood_risk (0-1, where 1 is highest risk)
-        - crime_rate (0-1, where 1 is highest risk)
-        - air_quality_index (0-1, where 1 is best)
-        - proximity_to_amenities (0-1, where 1 is best)
-        - transportation_score (0-1, where 1 is best)
-        - neighborhood_rating (0-1, where 1 is best)
-        - environmental_hazards (0-1, where 1 is highest risk)
-        - economic_growth_potential (0-1, where 1 is highest potential)
-        
-        Return ONLY the JSON object, without any explanation or formatting. No surrounding text, no markdown."""
 
-        response = client.chat.completions.create(
-            model=config.env.azure_openai_deployment,
-            messages=[
-                {"role": "system", "content": "You are a real estate GIS analysis expert. Provide accurate and detailed analysis of locations."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=500
+@router.post("/analyze/batch")
+async def analyze_locations(req: Request, request: BatchLocationRequest):
+    if not request.addresses:
+        raise HTTPException(status_code=400, detail="No addresses to analyze")
+    if len(request.addresses) > config.env.gis_batch_max_addresses:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.env.gis_batch_max_addresses} addresses can be analyzed per request"
         )
-        logging.info(response)
-        # Extract the JSON response from the model's output
-        analysis_result = response.choices[0].message.content
-        # Parse the JSON string into a dictionary
-        result_dict = json.loads(analysis_result)
-        
-        # Add coordinates to the response
-        if coordinates:
-            result_dict["coordinates"] = coordinates.dict()
-        
-        return result_dict
-
-    except Exception as e:
-        print("error", e)
-        raise HTTPException(status_code=500, detail=f"Error analyzing location: {str(e)}") 
\ No newline at end of file
+    return StreamingResponse(stream_batch(req, request.addresses), media_type=STREAM_MEDIA_TYPES["ndjson"])
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
@@ -9,6 +11,15 @@ from .middleware.auth import JWTMiddleware
 
 from .routers.api.v1 import router as v1_router
 
+from .services.case import process_case_job, mark_case_failed
+from .services.jobs import JobWorkerPool, case_job_queue
+from .services.storage import ensure_upload_indexes
+from .services.chat import ensure_chat_indexes
+from .services.local_search import local_search
+from .services.geocoding import geocoder
+from .services.gis import ensure_gis_indexes
+from .services.gis_layers import gis_layers
+
 # logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
 
 logging.basicConfig(
@@ -16,10 +27,34 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 
-app = FastAPI()
-
 config: AppConfig = AppConfig()
 
+case_job_pool = JobWorkerPool(
+    case_job_queue,
+    process_case_job,
+    config.env.case_job_workers,
+    max_attempts=config.env.case_job_max_attempts,
+    on_failure=mark_case_failed
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_upload_indexes()
+    await ensure_chat_indexes()
+    await ensure_gis_indexes()
+    await asyncio.to_thread(gis_layers.load)
+    if config.env.kb_retriever == "local":
+        await local_search.refresh(force=True)
+    await case_job_pool.start()
+    yield
+    await case_job_pool.stop()
+    await geocoder.close()
+    await config.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
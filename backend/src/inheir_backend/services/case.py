@@ -0,0 +1,253 @@
+import json
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+from bson import ObjectId
+from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+from langchain.chains.llm import LLMChain
+from ..config import AppConfig, get_config
+from ..models.case import CaseAnalysis, CaseSummary, DocumentError, DocumentResult
+from .documents import extract_case_documents
+from .entities import extract_entities
+from .case_index import case_chunk_index
+from .response_cache import response_cache
+from ..helpers.filename import get_content_hash
+from .jobs import PermanentJobError
+
+config: AppConfig = get_config()
+
+
+case_summary_system_template = """You are a legal assistant specialized in property and title resolution who generates insights on summary."""
+case_summary_user_template = """\
+### Documents summary:
+{{{{ document_summary }}}}
+
+{{{{
+  "valid": boolean, # should be only true or false
+  "legitimate": boolean, # should be only true or false
+  "case_type": string, # no null
+  "entity": [
+    {{
+      "name": string,
+      "entity_type": "person" | "organization",
+      "valid": boolean
+    }}
+  ],
+  "asset": [
+    {{
+      "name": string,
+      "location": string | null,
+      "asset_type": string,
+      "net_worth": string | null,
+      "coordinates": string | null
+    }}
+  ],
+  "references": [ string ]
+}}}}
+
+Guidelines:
+- Use plain English.
+- Use null if information is missing.
+- Return ONLY JSON, without any formatting. No surrounding text, no markdown.
+"""
+
+case_summary_prompt_template = ChatPromptTemplate.from_messages([
+    SystemMessagePromptTemplate.from_template(case_summary_system_template),
+    HumanMessagePromptTemplate.from_template(case_summary_user_template)
+])
+
+case_analysis_system_template = """\
+You are a legal assistant specialized in property and title resolution. Analyze the given legal documents and return:
+- summary: a concise summary of the case based on the documents.
+- recommendations: clear, actionable insights on ownership and solving the dispute, in simple lay person English, no emoji.
+- valid, legitimate: whether the case and its documents appear valid and legitimate.
+- case_type: the type of case, for example "Dispute" or "Inheritance".
+- references: laws, acts or documents relevant to the case.
+"""
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+
+async def summarize_case_multi(document_content: str, supporting_documents_text: str) -> dict:
+    """
+    Summarize a case with three sequential LLM calls: summary, recommendations and structured fields.
+
+    :param document_content: Text of the main case document.
+    :param supporting_documents_text: Numbered text of the supporting documents.
+    :return: Dictionary with the summary, recommendations and structured case fields.
+    """
+    client = config.langchain_llm
+    llm = config.llm
+    document_summary = await llm.chat.completions.create(
+        model=config.env.azure_openai_model_name,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant who summarizes cases based on given legal documents."},
+            {"role": "user", "content": f"### Document\n{document_content}\n###Supporting documents\n{supporting_documents_text}"}
+        ],
+        max_tokens=400,
+        temperature=0.7
+    )
+    document_summary = document_summary.choices[0].message.content
+
+    recommendations = await llm.chat.completions.create(
+        model=config.env.azure_openai_model_name,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant who summarizes cases based on given legal documents. Give only JSON list of strings, no object, no markdown, no formatting, no emoji, just content in string format in simple lay person English"},
+            {"role": "user", "content": f"Based on below summary\n {document_summary}\n provide clear, actionable insights on ownership and solving the dispute"}
+        ],
+        max_tokens=400,
+        temperature=0.7
+    )
+    recommendations = json.loads(recommendations.choices[0].message.content)
+    chain = LLMChain(
+        llm=client,
+        prompt=case_summary_prompt_template
+    )
+
+    logging.info("Executing chain")
+    chain_info = {
+        "document_summary": document_summary
+    }
+
+    response = await chain.ainvoke(chain_info)
+    case_summ_dict = json.loads(response.pop("text"))
+    case_summ_dict["recommendations"] = recommendations
+    case_summ_dict["summary"] = document_summary
+    return case_summ_dict
+
+
+async def summarize_case_single(document_content: str, supporting_documents_text: str) -> dict:
+    """
+    Summarize a case with a single structured-output LLM call.
+
+    :param document_content: Text of the main case document.
+    :param supporting_documents_text: Numbered text of the supporting documents.
+    :return: Dictionary with the summary, recommendations and structured case fields.
+    """
+    response = await config.llm.beta.chat.completions.parse(
+        model=config.env.azure_openai_model_name,
+        messages=[
+            {"role": "system", "content": case_analysis_system_template},
+            {"role": "user", "content": f"### Document\n{document_content}\n###Supporting documents\n{supporting_documents_text}"}
+        ],
+        response_format=CaseAnalysis,
+        max_tokens=1200,
+        temperature=0.7
+    )
+    message = response.choices[0].message
+    if message.parsed is None:
+        raise ValueError(f"Case analysis was not returned: {message.refusal}")
+    return message.parsed.model_dump()
+
+
+async def analyze_case(
+    case_id: str,
+    documents: List[DocumentResult],
+    set_stage: Optional[StageCallback] = None
+) -> CaseSummary:
+    """
+    Run entity detection and LLM summarization over extracted case documents and store the case summary.
+
+    :param case_id: Case the documents belong to.
+    :param documents: Extracted documents, main document first.
+    :param set_stage: Optional callback to report the current pipeline stage.
+    :return: The stored CaseSummary.
+    """
+    main_document, supporting_results = documents[0], documents[1:]
+    document_url = main_document.url
+    document_content = main_document.content
+
+    if set_stage:
+        await set_stage("entities")
+    persons, properties, key_phrases = await extract_entities(
+        [document_content, *(result.content for result in supporting_results)])
+
+    supporting_documents_urls = [result.url for result in supporting_results if result.url]
+    supporting_document_content = [
+        f"{idx + 1}. {result.content}"
+        for idx, result in enumerate(supporting_results)
+        if result.content is not None
+    ]
+    supporting_document_errors = [
+        DocumentError(filename=result.filename, error=result.error).model_dump()
+        for result in supporting_results
+        if result.error is not None
+    ]
+    supporting_documents_text = "\n".join(supporting_document_content)
+
+    if set_stage:
+        await set_stage("summarizing")
+    started = time.perf_counter()
+    if config.env.case_summary_mode == "multi":
+        case_summ_dict = await summarize_case_multi(document_content, supporting_documents_text)
+    else:
+        case_summ_dict = await summarize_case_single(document_content, supporting_documents_text)
+    logging.info(f"Case summarization ({config.env.case_summary_mode}) took {time.perf_counter() - started:.2f}s")
+
+    case_summ_dict["case_id"] = case_id
+    case_summ_dict["document_content"] = document_content
+    case_summ_dict["supporting_document_content"] = supporting_documents_text
+    case_summ_dict["document"] = document_url
+    case_summ_dict["supporting_documents"] = supporting_documents_urls
+    case_summ_dict["supporting_document_errors"] = supporting_document_errors or None
+    case_summ_dict["entity"] = persons
+    case_summ_dict["asset"] = properties
+    case_summ_dict["key_phrases"] = key_phrases or None
+    case_summ_dict["content_version"] = get_content_hash(
+        (document_content + "\n" + supporting_documents_text).encode("utf-8"))
+    case_summ_dict["valid"] = True
+    case_summ_dict["legitimate"] = True
+
+    if case_summ_dict.get("case_type") is None:
+        case_summ_dict["case_type"] = "Dispute"
+
+    case_summary = CaseSummary(**case_summ_dict)
+    # Upsert so that a retried job does not create a duplicate summary
+    await config.db["case_summary"].replace_one(
+        {"case_id": case_id}, case_summary.model_dump(), upsert=True)
+    try:
+        await response_cache.invalidate_case(case_id)
+    except Exception as e:
+        logging.warning(f"Could not invalidate cached responses for case {case_id}: {e}")
+
+    if set_stage:
+        await set_stage("indexing")
+    try:
+        await case_chunk_index.index_case(case_id, document_content + "\n" + supporting_documents_text)
+    except Exception as e:
+        # The case is still usable: chat indexes it on the first query
+        logging.error(f"Case chunk indexing failed for case {case_id}: {e}")
+    return case_summary
+
+
+async def process_case_job(job: dict, set_stage: StageCallback):
+    """
+    Job handler for asynchronous case creation. Documents are already uploaded by the endpoint.
+
+    :param job: Job document from the case job queue.
+    :param set_stage: Callback to report the current pipeline stage.
+    """
+    payload = job["payload"]
+    case_id = payload["case_id"]
+    case_details_collection = config.db["case_details"]
+
+    await set_stage("extracting")
+    documents = [DocumentResult(**document) for document in payload["documents"]]
+    # Errors extracting the main document are retried; a document without readable text is not
+    documents = await extract_case_documents(documents, raise_main_errors=True)
+
+    main_document = documents[0]
+    if main_document.content is None:
+        raise PermanentJobError(f"Invalid document. {main_document.error}")
+
+    await analyze_case(case_id, documents, set_stage)
+    await case_details_collection.update_one(
+        {"_id": ObjectId(case_id)}, {"$set": {"status": "Open"}})
+
+
+async def mark_case_failed(job: dict, error: str):
+    """
+    Failure handler for case jobs that ran out of attempts.
+    """
+    await config.db["case_details"].update_one(
+        {"_id": ObjectId(job["payload"]["case_id"])}, {"$set": {"status": "Failed"}})
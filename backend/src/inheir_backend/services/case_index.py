@@ -0,0 +1,173 @@
+import logging
+from typing import List, Tuple
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from motor.motor_asyncio import AsyncIOMotorCollection
+from langchain_openai import AzureOpenAIEmbeddings
+from ..config import AppConfig, get_config
+from ..helpers.cache import LRUCache
+from ..helpers.chunking import chunk_by_tokens
+
+config: AppConfig = get_config()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold().rstrip("?!. ")
+
+
+class CaseChunkIndex:
+    """
+    Embeddings of each case's text chunks, stored next to the case summary in the `case_chunks` collection.
+    Search runs in process over the case's vectors with NumPy, or on MongoDB Atlas vector search
+    when `vector_search` is "atlas", falling back to NumPy if the remote search fails.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        embeddings: AzureOpenAIEmbeddings,
+        chunk_tokens: int,
+        chunk_overlap_tokens: int,
+        chunk_encoding: str,
+        vector_search: str,
+        vector_index_name: str,
+        query_cache_size: int,
+        vector_cache_size: int,
+        vector_cache_ttl_seconds: int
+    ):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.chunk_encoding = chunk_encoding
+        self.vector_search = vector_search
+        self.vector_index_name = vector_index_name
+        self.query_cache = LRUCache(query_cache_size)
+        # Other processes re-index cases without invalidating this cache, so entries expire
+        self.vector_cache = LRUCache(vector_cache_size, vector_cache_ttl_seconds)
+        self.indexed = False
+
+    async def ensure_indexes(self):
+        if not self.indexed:
+            await self.collection.create_index([("case_id", ASCENDING), ("chunk", ASCENDING)], unique=True)
+            self.indexed = True
+
+    async def index_case(self, case_id: str, text: str) -> int:
+        """
+        Chunk and embed the case text, replacing any previous chunks of the case. Chunks are upserted
+        in place and only the chunks past the new count are deleted, so searches never see the case empty.
+
+        :param case_id: Case the text belongs to.
+        :param text: Full case text.
+        :return: Number of chunks indexed.
+        """
+        chunks = chunk_by_tokens(text, self.chunk_tokens, self.chunk_overlap_tokens, self.chunk_encoding)
+        vectors = await self.embeddings.aembed_documents(chunks) if chunks else []
+
+        await self.ensure_indexes()
+        operations = [
+            UpdateOne(
+                {"case_id": case_id, "chunk": idx},
+                {"$set": {"text": chunk, "embedding": vector}},
+                upsert=True
+            )
+            for idx, (chunk, vector) in enumerate(zip(chunks, vectors))
+        ]
+        if operations:
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Concurrent first indexing of a case races on the unique (case_id, chunk) index;
+                # running the upserts again updates the chunks the other writer inserted
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+                await self.collection.bulk_write(operations, ordered=False)
+        await self.collection.delete_many({"case_id": case_id, "chunk": {"$gte": len(chunks)}})
+        self.vector_cache.pop(case_id)
+        logging.info(f"Indexed {len(chunks)} chunks for case {case_id}")
+        return len(chunks)
+
+    async def has_case(self, case_id: str) -> bool:
+        return await self.collection.count_documents({"case_id": case_id}, limit=1) > 0
+
+    async def embed_query(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(key)
+            self.query_cache.set(key, vector)
+        return vector
+
+    async def load_vectors(self, case_id: str) -> Tuple[List[str], np.ndarray]:
+        """
+        :return: Chunk texts and their L2-normalized embedding matrix, cached per case once the case has chunks.
+        """
+        cached = self.vector_cache.get(case_id)
+        if cached is not None:
+            return cached
+        cursor = self.collection.find({"case_id": case_id}, {"text": 1, "embedding": 1}).sort("chunk", ASCENDING)
+        documents = [document async for document in cursor]
+        texts = [document["text"] for document in documents]
+        matrix = np.asarray([document["embedding"] for document in documents], dtype=np.float32)
+        if len(texts):
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            self.vector_cache.set(case_id, (texts, matrix))
+        return texts, matrix
+
+    async def search_local(self, case_id: str, vector: List[float], k: int) -> List[str]:
+        texts, matrix = await self.load_vectors(case_id)
+        if not texts:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ (query / max(np.linalg.norm(query), 1e-12))
+        k = min(k, len(texts))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [texts[idx] for idx in top[np.argsort(-scores[top])]]
+
+    async def search_atlas(self, case_id: str, vector: List[float], k: int) -> List[str]:
+        cursor = self.collection.aggregate([
+            {
+                "$vectorSearch": {
+                    "index": self.vector_index_name,
+                    "path": "embedding",
+                    "queryVector": vector,
+                    "numCandidates": k * 10,
+                    "limit": k,
+                    "filter": {"case_id": case_id}
+                }
+            },
+            {"$project": {"text": 1}}
+        ])
+        return [document["text"] async for document in cursor]
+
+    async def search(self, case_id: str, query: str, k: int) -> List[str]:
+        """
+        Retrieve the chunks of a case most similar to the query.
+
+        :param case_id: Case to search.
+        :param query: User query.
+        :param k: Number of chunks to return.
+        :return: Chunk texts, most similar first.
+        """
+        vector = await self.embed_query(query)
+        if self.vector_search == "atlas":
+            try:
+                return await self.search_atlas(case_id, vector, k)
+            except Exception as e:
+                logging.warning(f"Atlas vector search failed, searching in process: {e}")
+        return await self.search_local(case_id, vector, k)
+
+
+case_chunk_index = CaseChunkIndex(
+    config.db["case_chunks"],
+    config.embeddings,
+    config.env.case_chunk_tokens,
+    config.env.case_chunk_overlap_tokens,
+    config.env.chunk_encoding,
+    config.env.case_vector_search,
+    config.env.case_vector_index_name,
+    config.env.query_embedding_cache_size,
+    config.env.case_vector_cache_size,
+    config.env.case_vector_cache_ttl_seconds
+)
@@ -0,0 +1,322 @@
+import logging
+from operator import itemgetter
+from typing import AsyncIterator, List, Optional
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+from pymongo import ASCENDING
+from ..config import AppConfig, get_config
+from ..models.chat import Chat
+from ..helpers.chunking import chunk_by_tokens_capped
+from ..helpers.filename import get_content_hash
+from .case_index import case_chunk_index
+from .response_cache import ResponseCache, response_cache
+from .memory import ConversationMemory
+
+config: AppConfig = get_config()
+
+
+chatbot_case_template = """\
+You are a legal assistant analyzing a legal case document to answer a user query.
+
+Context:
+{chunk}
+
+Conversation so far:
+{history}
+
+User query:
+{query}
+
+Answer in plain English with clear reasoning.
+"""
+
+chatbot_reduce_template = """\
+You are a legal assistant. The answers below were each written from a different part of the same legal case.
+
+Partial answers:
+{answers}
+
+Conversation so far:
+{history}
+
+User query:
+{query}
+
+Merge them into a single answer to the query in plain English with clear reasoning. \
+Remove repetition and ignore partial answers that say the part contains no relevant information.
+"""
+
+chatbot_law_template = """\
+You are a helpful legal assistant that answers a query with relevant law data \
+and worldwide legal regulations, policies and laws. If no data is provided, answer \
+using publicly available knowledge, especially by trying to understand the nationality behind the query \
+to answer based on that country's laws and regulations to maintain fairness. \
+Always aim to help the user as best as you can. Keep your responses concise and relevant.
+
+Here's the query:
+{query}
+
+Guidelines:
+- Use plain English.
+- Give generic answers if needed.
+"""
+
+# Bump when the chat prompts or retrieval change so that cached responses are not reused
+CHAT_PROMPT_VERSION = "4"
+
+chatbot_case_prompt_template = ChatPromptTemplate.from_template(chatbot_case_template)
+chatbot_reduce_prompt_template = ChatPromptTemplate.from_template(chatbot_reduce_template)
+chatbot_law_prompt_template = ChatPromptTemplate.from_template(chatbot_law_template)
+
+
+def get_case_text(case_summary_doc: dict) -> str:
+    return (case_summary_doc.get("document_content") or "") + "\n" + \
+           (case_summary_doc.get("supporting_document_content") or "")
+
+
+def get_case_version(case_summary_doc: dict) -> str:
+    """
+    Content version of a case, computed from its text for cases stored before versions were recorded.
+    """
+    return case_summary_doc.get("content_version") or get_content_hash(get_case_text(case_summary_doc).encode("utf-8"))
+
+
+async def map_case_chunks(query: str, chunks: List[str], history: str = "None") -> List[str]:
+    """
+    Map stage: answer the query against every chunk concurrently.
+
+    :param query: User query.
+    :param chunks: Case text chunks.
+    :param history: Formatted conversation memory.
+    :return: Partial answer for each chunk, in chunk order.
+    """
+    rag_chain = (
+        {
+            "chunk": itemgetter("chunk"),
+            "history": itemgetter("history"),
+            "query": itemgetter("query"),
+        }
+        | chatbot_case_prompt_template
+        | config.langchain_llm
+        | StrOutputParser()
+    )
+    return await rag_chain.abatch(
+        [{"chunk": chunk, "history": history, "query": query} for chunk in chunks],
+        config={"max_concurrency": config.env.chat_map_concurrency}
+    )
+
+
+class PreparedAnswer:
+    """
+    Final generation step of an answer: either a fixed text, or a chain and its inputs
+    that can be awaited for the whole answer or streamed token by token.
+    Generated answers are stored in the response cache under `cache_key` once complete.
+    """
+
+    def __init__(
+        self,
+        text: Optional[str] = None,
+        chain: Optional[Runnable] = None,
+        inputs: Optional[dict] = None,
+        cache_key: Optional[str] = None,
+        case_id: Optional[str] = None
+    ):
+        self.text = text
+        self.chain = chain
+        self.inputs = inputs
+        self.cache_key = cache_key
+        self.case_id = case_id
+
+    async def store(self, response: str):
+        if self.cache_key is None:
+            return
+        try:
+            await response_cache.put(self.cache_key, response, self.case_id)
+        except Exception as e:
+            logging.warning(f"Could not cache chat response: {e}")
+
+    async def invoke(self) -> str:
+        if self.chain is None:
+            return self.text
+        response = await self.chain.ainvoke(self.inputs)
+        await self.store(response)
+        return response
+
+    async def stream(self) -> AsyncIterator[str]:
+        if self.chain is None:
+            yield self.text
+            return
+        tokens = []
+        async for token in self.chain.astream(self.inputs):
+            if token:
+                tokens.append(token)
+                yield token
+        await self.store("".join(tokens))
+
+
+async def get_cached_answer(cache_key: Optional[str]) -> Optional[PreparedAnswer]:
+    if cache_key is None:
+        return None
+    try:
+        response = await response_cache.get(cache_key)
+    except Exception as e:
+        logging.warning(f"Could not read chat response cache: {e}")
+        return None
+    return PreparedAnswer(text=response) if response is not None else None
+
+
+def make_cache_key(query: str, case_id: Optional[str] = None, content_version: Optional[str] = None) -> Optional[str]:
+    if not config.env.response_cache_enabled:
+        return None
+    return ResponseCache.make_key(
+        query, config.env.azure_openai_deployment, CHAT_PROMPT_VERSION, case_id, content_version)
+
+
+def prepare_reduce(query: str, answers: List[str], history: str = "None") -> PreparedAnswer:
+    """
+    Reduce stage: merge partial answers into a single response.
+
+    :param query: User query.
+    :param answers: Partial answers from the map stage.
+    :param history: Formatted conversation memory.
+    :return: Prepared merged answer.
+    """
+    if not answers:
+        return PreparedAnswer(text="No relevant case information found.")
+    if len(answers) == 1:
+        return PreparedAnswer(text=answers[0])
+    reduce_chain = chatbot_reduce_prompt_template | config.langchain_llm | StrOutputParser()
+    numbered = "\n\n".join(f"{idx + 1}. {answer}" for idx, answer in enumerate(answers))
+    return PreparedAnswer(chain=reduce_chain, inputs={"answers": numbered, "history": history, "query": query})
+
+
+async def prepare_case_answer_map_reduce(query: str, case_summary_doc: dict, history: str = "None") -> PreparedAnswer:
+    """
+    Answer a query about a case with a map-reduce over the whole case text.
+    Chunks of CHAT_CHUNK_TOKENS tokens are enlarged when needed so that at most CHAT_MAP_MAX_CHUNKS calls are made.
+
+    :param query: User query.
+    :param case_summary_doc: Case summary document with the case text.
+    :param history: Formatted conversation memory.
+    :return: Prepared reduce step.
+    """
+    case_text = get_case_text(case_summary_doc)
+    chunks, chunk_tokens = chunk_by_tokens_capped(
+        case_text,
+        config.env.chat_chunk_tokens,
+        config.env.chat_map_max_chunks,
+        config.env.chat_chunk_overlap_tokens,
+        config.env.chunk_encoding
+    )
+    logging.info(f"Answering case query over {len(chunks)} chunks of up to {chunk_tokens} tokens")
+
+    answers = await map_case_chunks(query, chunks, history)
+    return prepare_reduce(query, answers, history)
+
+
+async def prepare_case_answer(
+    query: str,
+    case_summary_doc: dict,
+    memory: Optional[ConversationMemory] = None
+) -> PreparedAnswer:
+    """
+    Prepare the answer to a query about a case from the top-k case chunks most similar to the query.
+    Cases created before the chunk index existed are indexed on their first query.
+    Falls back to a map-reduce over the whole case text if embedding fails.
+    Answers that depend on earlier turns of the conversation are not cached.
+
+    :param query: User query.
+    :param case_summary_doc: Case summary document with the case id and text.
+    :param memory: Conversation memory of the case chat.
+    :return: Prepared answer.
+    """
+    case_id = case_summary_doc["case_id"]
+    memory = memory or ConversationMemory()
+    history = memory.format()
+    cache_key = make_cache_key(query, case_id, get_case_version(case_summary_doc)) if memory.is_empty() else None
+    cached = await get_cached_answer(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        if not await case_chunk_index.has_case(case_id):
+            await case_chunk_index.index_case(case_id, get_case_text(case_summary_doc))
+        chunks = await case_chunk_index.search(case_id, query, config.env.case_chunk_top_k)
+    except Exception as e:
+        logging.warning(f"Case chunk retrieval failed, answering over the whole case: {e}")
+        answer = await prepare_case_answer_map_reduce(query, case_summary_doc, history)
+        answer.cache_key, answer.case_id = cache_key, case_id
+        return answer
+
+    if not chunks:
+        return PreparedAnswer(text="No relevant case information found.")
+    logging.info(f"Answering case query over {len(chunks)} retrieved chunks")
+    rag_chain = chatbot_case_prompt_template | config.langchain_llm | StrOutputParser()
+    return PreparedAnswer(
+        chain=rag_chain,
+        inputs={"chunk": "\n\n".join(chunks), "history": history, "query": query},
+        cache_key=cache_key,
+        case_id=case_id
+    )
+
+
+async def prepare_law_answer(query: str) -> PreparedAnswer:
+    """
+    Prepare the answer to a general law question.
+
+    :param query: User query.
+    :return: Prepared answer.
+    """
+    cache_key = make_cache_key(query)
+    cached = await get_cached_answer(cache_key)
+    if cached is not None:
+        return cached
+    law_chain = chatbot_law_prompt_template | config.langchain_llm | StrOutputParser()
+    return PreparedAnswer(chain=law_chain, inputs={"query": query}, cache_key=cache_key)
+
+
+async def answer_case_query(query: str, case_summary_doc: dict, memory: Optional[ConversationMemory] = None) -> str:
+    """
+    Answer a query about a case in full. See `prepare_case_answer`.
+    """
+    return await (await prepare_case_answer(query, case_summary_doc, memory)).invoke()
+
+
+async def answer_law_query(query: str) -> str:
+    """
+    Answer a general law question in full.
+    """
+    return await (await prepare_law_answer(query)).invoke()
+
+
+async def ensure_chat_indexes():
+    """
+    Create the index used to page through the chats of a case.
+    """
+    await config.db["chat_history"].create_index(
+        [("user_id", ASCENDING), ("case_id", ASCENDING), ("_id", ASCENDING)])
+
+
+async def save_chat_history(query: str, response: str, case_id: Optional[str], user_id: str, document_url: Optional[str]) -> Chat:
+    """
+    Store a chat turn in the chat history.
+
+    :return: The stored Chat.
+    """
+    chat_history_doc = {
+        "query": {
+            "role": "user",
+            "content": query
+        },
+        "response": {
+            "role": "bot",
+            "content": response
+        },
+        "case_id": case_id,
+        "user_id": user_id,
+        "document": document_url
+    }
+    chat_insert_result = await config.db["chat_history"].insert_one(chat_history_doc)
+    chat_history_doc["chat_id"] = str(chat_insert_result.inserted_id)
+    return Chat(**chat_history_doc)
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import List, Optional
+from fastapi import UploadFile
+from ..config import AppConfig, get_config
+from ..helpers.concurrency import gather_bounded
+from ..models.case import DocumentResult
+from .rag import process_upload_document
+from .storage import upload_user_file
+
+config: AppConfig = get_config()
+
+# Process-wide cap on documents being uploaded/extracted at the same time
+document_semaphore = asyncio.Semaphore(config.env.document_processing_concurrency)
+
+
+async def upload_document(file: UploadFile, user_id: str, case_id: str) -> DocumentResult:
+    """
+    Upload a single case document without extracting it.
+
+    :param file: Uploaded file from the FastAPI endpoint.
+    :param user_id: Owner of the case.
+    :param case_id: Case the document belongs to.
+    :return: DocumentResult with the blob URL.
+    """
+    user_document = await upload_user_file(file, user_id=user_id, case_id=case_id, chat_id=None, case=True)
+    return DocumentResult(filename=file.filename, url=user_document.get("url"))
+
+
+async def extract_document(document: DocumentResult) -> DocumentResult:
+    """
+    Extract the text of an uploaded document. Extraction errors other than an unreadable document are raised.
+
+    :param document: DocumentResult with the blob URL.
+    :return: DocumentResult with the extracted content, or an error if the document has no readable text.
+    """
+    content = await process_upload_document(document.url)
+    if content is None or not content.strip():
+        return document.model_copy(update={"error": "Document contains no readable text."})
+    return document.model_copy(update={"content": content.strip(), "error": None})
+
+
+async def upload_and_extract(file: UploadFile, user_id: str, case_id: str) -> DocumentResult:
+    """
+    Upload a single case document and extract its text.
+
+    :param file: Uploaded file from the FastAPI endpoint.
+    :param user_id: Owner of the case.
+    :param case_id: Case the document belongs to.
+    :return: DocumentResult with the blob URL and extracted content.
+    """
+    document = await upload_document(file, user_id, case_id)
+    return await extract_document(document)
+
+
+def collect_results(names: List[Optional[str]], results: list, base: Optional[List[DocumentResult]] = None) -> List[DocumentResult]:
+    """
+    Turn (result, error) pairs from a fan-out into DocumentResults, keeping per-document errors.
+    """
+    documents = []
+    for idx, (result, error) in enumerate(results):
+        if error is not None:
+            logging.error(f"Error processing document {names[idx]}: {error}")
+            previous = base[idx] if base else DocumentResult(filename=names[idx])
+            result = previous.model_copy(update={"error": str(error)})
+        documents.append(result)
+    return documents
+
+
+async def process_case_documents(files: List[UploadFile], user_id: str, case_id: str) -> List[DocumentResult]:
+    """
+    Upload and extract all documents of a case concurrently.
+
+    :param files: Uploaded files, main document first.
+    :param user_id: Owner of the case.
+    :param case_id: Case the documents belong to.
+    :return: One DocumentResult per file, in the same order as `files`.
+    """
+    results = await gather_bounded(
+        files,
+        lambda file: upload_and_extract(file, user_id, case_id),
+        config.env.case_document_concurrency,
+        document_semaphore
+    )
+    return collect_results([file.filename for file in files], results)
+
+
+async def upload_case_documents(files: List[UploadFile], user_id: str, case_id: str) -> List[DocumentResult]:
+    """
+    Upload all documents of a case concurrently, leaving extraction for later.
+
+    :param files: Uploaded files, main document first.
+    :param user_id: Owner of the case.
+    :param case_id: Case the documents belong to.
+    :return: One DocumentResult per file, in the same order as `files`.
+    """
+    results = await gather_bounded(
+        files,
+        lambda file: upload_document(file, user_id, case_id),
+        config.env.case_document_concurrency,
+        document_semaphore
+    )
+    return collect_results([file.filename for file in files], results)
+
+
+async def extract_case_documents(documents: List[DocumentResult], raise_main_errors: bool = False) -> List[DocumentResult]:
+    """
+    Extract all uploaded documents of a case concurrently.
+
+    :param documents: Uploaded documents, main document first.
+    :param raise_main_errors: Raise extraction errors of the main document instead of recording them.
+    :return: One DocumentResult per document, in the same order.
+    """
+    pending = [document for document in documents if document.url and document.error is None]
+    results = await gather_bounded(
+        pending,
+        extract_document,
+        config.env.case_document_concurrency,
+        document_semaphore
+    )
+    if raise_main_errors and pending and pending[0] is documents[0] and results[0][1] is not None:
+        raise results[0][1]
+    extracted = iter(collect_results([document.filename for document in pending], results, pending))
+    return [next(extracted) if document.url and document.error is None else document for document in documents]
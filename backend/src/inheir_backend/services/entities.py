@@ -0,0 +1,146 @@
+import logging
+import re
+from typing import Dict, List, Tuple
+from azure.ai.textanalytics import (
+    ExtractKeyPhrasesAction,
+    RecognizeEntitiesAction,
+    RecognizePiiEntitiesAction
+)
+from ..config import AppConfig, get_config
+from ..helpers.concurrency import gather_bounded
+
+config: AppConfig = get_config()
+
+PERSON_CATEGORIES = ["Person"]
+PROPERTY_CATEGORIES = ["Organization", "Address", "Location"]
+
+sentence_boundary = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def split_sentences(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into chunks of at most `max_chars` characters, breaking on sentence boundaries.
+    Sentences longer than `max_chars` are broken on whitespace.
+
+    :param text: Text to split.
+    :param max_chars: Maximum chunk size in characters.
+    :return: List of non-empty chunks.
+    """
+    sentences = []
+    for sentence in sentence_boundary.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def normalize_entity(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class EntityCollector:
+    """
+    Merges entities recognized across chunks and documents, keeping the first spelling of each.
+    """
+
+    def __init__(self):
+        self.persons: Dict[str, dict] = {}
+        self.properties: Dict[Tuple[str, str], dict] = {}
+        self.key_phrases: Dict[str, str] = {}
+
+    def add_entity(self, text: str, category: str):
+        key = normalize_entity(text)
+        if category in PERSON_CATEGORIES:
+            self.persons.setdefault(key, {
+                "name": text,
+                "valid": True,
+                "entity_type": "person"
+            })
+        elif category in PROPERTY_CATEGORIES:
+            self.properties.setdefault((category, key), {
+                "name": text,
+                "location": text,
+                "asset_type": category,
+                "coordinates": None,
+                "net_worth": None
+            })
+
+    def add_key_phrase(self, phrase: str):
+        self.key_phrases.setdefault(normalize_entity(phrase), phrase)
+
+
+async def recognize_pii_batch(batch: List[str]):
+    return await config.text_analytics_client.recognize_pii_entities(batch)
+
+
+async def analyze_actions_batch(batch: List[str]):
+    poller = await config.text_analytics_client.begin_analyze_actions(
+        batch,
+        actions=[RecognizePiiEntitiesAction(), RecognizeEntitiesAction(), ExtractKeyPhrasesAction()]
+    )
+    pages = await poller.result()
+    return [action_results async for action_results in pages]
+
+
+async def extract_entities(texts: List[str]):
+    """
+    Extract persons, properties and key phrases from the case documents.
+    Documents are split into service-sized chunks on sentence boundaries, sent in batches
+    of as many chunks per request as the API allows, and batches run in parallel.
+
+    :param texts: Text of each document, main document first.
+    :return: Tuple of (persons, properties, key_phrases) lists, deduplicated across documents.
+    """
+    chunks = [
+        chunk
+        for text in texts if text
+        for chunk in split_sentences(text, config.env.entity_chunk_chars)
+    ]
+    multi_action = config.env.entity_multi_action
+    batch_size = config.env.entity_actions_batch_size if multi_action else config.env.entity_batch_size
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+    results = await gather_bounded(
+        batches,
+        analyze_actions_batch if multi_action else recognize_pii_batch,
+        config.env.entity_concurrency
+    )
+
+    collector = EntityCollector()
+    for result, error in results:
+        if error is not None:
+            logging.error(f"Azure entity recognition failed: {error}")
+            continue
+        for document_result in result:
+            # Multi-action requests return one result per action for each chunk
+            action_results = document_result if multi_action else [document_result]
+            for action_result in action_results:
+                if action_result.is_error:
+                    logging.warning(f"Entity extraction error: {action_result.error}")
+                    continue
+                for entity in getattr(action_result, "entities", []):
+                    collector.add_entity(entity.text, entity.category)
+                for phrase in getattr(action_result, "key_phrases", []):
+                    collector.add_key_phrase(phrase)
+
+    return (
+        list(collector.persons.values()),
+        list(collector.properties.values()),
+        list(collector.key_phrases.values())
+    )
@@ -0,0 +1,125 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from pymongo import ASCENDING, UpdateOne
+from motor.motor_asyncio import AsyncIOMotorCollection
+from ..config import AppConfig, get_config
+
+config: AppConfig = get_config()
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extracted document text, keyed by the SHA-256 of the file bytes.
+    Entries are evicted least recently used first once the cache holds more than `max_entries`.
+    Pages of documents still being analyzed are kept in a separate collection until the document completes.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, pages_collection: AsyncIOMotorCollection, max_entries: int, max_entry_bytes: int):
+        self.collection = collection
+        self.pages_collection = pages_collection
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.indexed = False
+
+    async def ensure_indexes(self):
+        if not self.indexed:
+            await self.collection.create_index([("last_accessed", ASCENDING)])
+            # Partial pages of abandoned documents expire after a day
+            await self.pages_collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=86400)
+            await self.pages_collection.create_index([("digest", ASCENDING)])
+            self.indexed = True
+
+    async def get(self, digest: str) -> Optional[List[str]]:
+        """
+        :param digest: SHA-256 hex digest of the file bytes.
+        :return: Extracted text per page, or None on a miss.
+        """
+        entry = await self.collection.find_one_and_update(
+            {"_id": digest},
+            {"$set": {"last_accessed": datetime.utcnow()}, "$inc": {"hits": 1}},
+            {"pages": 1}
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["pages"]
+
+    async def put(self, digest: str, pages: List[str]):
+        """
+        :param digest: SHA-256 hex digest of the file bytes.
+        :param pages: Extracted text per page.
+        """
+        size = sum(len(page.encode("utf-8")) for page in pages)
+        if size > self.max_entry_bytes:
+            logging.info(f"Skipping extraction cache for {digest}: {size} bytes")
+            return
+        await self.ensure_indexes()
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": digest},
+            {
+                "$set": {"pages": pages, "size": size, "last_accessed": now},
+                "$setOnInsert": {"created_at": now, "hits": 0}
+            },
+            upsert=True
+        )
+        await self.pages_collection.delete_many({"digest": digest})
+        await self.evict()
+
+    async def get_partial_pages(self, digest: str, page_numbers: List[int]) -> Dict[int, str]:
+        """
+        :param digest: SHA-256 hex digest of the file bytes.
+        :param page_numbers: 1-based page numbers to look up.
+        :return: Text of the pages already analyzed, keyed by page number.
+        """
+        cursor = self.pages_collection.find({"_id": {"$in": [f"{digest}:{number}" for number in page_numbers]}})
+        return {page["page_number"]: page["text"] async for page in cursor}
+
+    async def put_partial_pages(self, digest: str, pages: Dict[int, str]):
+        """
+        :param digest: SHA-256 hex digest of the file bytes.
+        :param pages: Text of analyzed pages, keyed by page number.
+        """
+        await self.ensure_indexes()
+        now = datetime.utcnow()
+        if pages:
+            await self.pages_collection.bulk_write([
+                UpdateOne(
+                    {"_id": f"{digest}:{page_number}"},
+                    {"$set": {"digest": digest, "page_number": page_number, "text": text, "created_at": now}},
+                    upsert=True
+                )
+                for page_number, text in pages.items()
+            ])
+
+    async def evict(self):
+        excess = await self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        cursor = self.collection.find({}, {"_id": 1}).sort("last_accessed", ASCENDING).limit(excess)
+        stale = [entry["_id"] async for entry in cursor]
+        if stale:
+            result = await self.collection.delete_many({"_id": {"$in": stale}})
+            self.evictions += result.deleted_count
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+extraction_cache = ExtractionCache(
+    config.db["extraction_cache"],
+    config.db["extraction_pages"],
+    config.env.extraction_cache_max_entries,
+    config.env.extraction_cache_max_entry_bytes
+)
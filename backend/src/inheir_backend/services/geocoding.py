@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from pymongo import ASCENDING
+from motor.motor_asyncio import AsyncIOMotorCollection
+from geopy.adapters import AioHTTPAdapter
+from geopy.exc import GeocoderRateLimited, GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable
+from geopy.geocoders import OpenCage
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+from ..config import AppConfig, get_config
+from ..helpers.cache import LRUCache
+from ..models.gis import Coordinates
+
+config: AppConfig = get_config()
+
+# Transient geocoding failures worth retrying; authentication, quota and query errors are not
+RETRYABLE_ERRORS = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+
+def normalize_address(address: str) -> str:
+    address = re.sub(r"\s*,\s*", ", ", " ".join(address.split()))
+    return address.casefold().strip(" ,.")
+
+
+class Geocoder:
+    """
+    Shared async OpenCage geocoder with an in-process LRU tier in front of the `geocode_cache` collection,
+    keyed by normalized address. Found coordinates are kept for `ttl_seconds`, addresses without a match
+    for `negative_ttl_seconds`. Concurrent lookups of the same address share one request.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        api_key: str,
+        timeout_seconds: float,
+        retries: int,
+        ttl_seconds: int,
+        negative_ttl_seconds: int,
+        local_entries: int
+    ):
+        self.collection = collection
+        self.geolocator = OpenCage(api_key=api_key, timeout=timeout_seconds, adapter_factory=AioHTTPAdapter)
+        self.retries = retries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.local = LRUCache(local_entries)
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+        self.indexed = False
+
+    async def ensure_indexes(self):
+        if not self.indexed:
+            await self.collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+            self.indexed = True
+
+    async def geocode(self, address: str) -> Optional[Coordinates]:
+        """
+        :param address: Free-text address.
+        :return: Coordinates of the address, or None when it could not be geocoded.
+        """
+        key = normalize_address(address)
+        if not key:
+            return None
+        # Local entries are {} for addresses without a match
+        entry = self.local.get(key)
+        if entry is not None:
+            return Coordinates(**entry) if entry else None
+
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.lookup(key))
+            self.pending[key] = future
+            future.add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def lookup(self, key: str) -> Optional[Coordinates]:
+        entry = await self.collection.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"latitude": 1, "longitude": 1, "found": 1, "expires_at": 1}
+        )
+        if entry is not None:
+            coordinates = Coordinates(latitude=entry["latitude"], longitude=entry["longitude"]) if entry["found"] else None
+            self.remember(key, coordinates, entry["expires_at"])
+            return coordinates
+
+        try:
+            coordinates = await self.request(key)
+        except GeocoderServiceError as e:
+            # Failures are not cached, so the address is retried on the next lookup
+            logging.error(f"Geocoding error for {key}: {str(e)}")
+            return None
+
+        ttl_seconds = self.ttl_seconds if coordinates else self.negative_ttl_seconds
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        self.remember(key, coordinates, expires_at)
+        await self.ensure_indexes()
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {
+                "found": coordinates is not None,
+                "latitude": coordinates.latitude if coordinates else None,
+                "longitude": coordinates.longitude if coordinates else None,
+                "expires_at": expires_at,
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+        return coordinates
+
+    async def request(self, address: str) -> Optional[Coordinates]:
+        """
+        Geocode with OpenCage, backing off between attempts without blocking the event loop.
+        """
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self.retries),
+            wait=wait_exponential(multiplier=0.5, max=4),
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            reraise=True
+        ):
+            with attempt:
+                self.requests += 1
+                location = await self.geolocator.geocode(address)
+        if location is None:
+            return None
+        return Coordinates(latitude=location.latitude, longitude=location.longitude)
+
+    def remember(self, key: str, coordinates: Optional[Coordinates], expires_at: datetime):
+        ttl_seconds = max((expires_at - datetime.utcnow()).total_seconds(), 0)
+        self.local.set(key, coordinates.model_dump() if coordinates else {}, ttl_seconds)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "local": self.local.stats()}
+
+    async def close(self):
+        await self.geolocator.__aexit__(None, None, None)
+
+
+geocoder = Geocoder(
+    config.db["geocode_cache"],
+    config.env.opencage_api_key,
+    config.env.geocode_timeout_seconds,
+    config.env.geocode_retries,
+    config.env.geocode_cache_ttl_seconds,
+    config.env.geocode_negative_ttl_seconds,
+    config.env.geocode_cache_local_entries
+)
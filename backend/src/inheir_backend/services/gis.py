@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from pymongo import ASCENDING, GEOSPHERE
+from ..config import AppConfig, get_config
+from ..helpers.cache import LRUCache
+from ..models.gis import METRIC_FIELDS, Coordinates
+from .geocoding import geocoder, normalize_address
+from .gis_layers import gis_layers
+
+config: AppConfig = get_config()
+
+# Complete analyses keyed by normalized address, in process and in the `gis_analyses` collection
+analysis_cache = LRUCache(config.env.gis_analysis_cache_entries, config.env.gis_analysis_cache_local_ttl_seconds)
+analyses = config.db["gis_analyses"]
+
+GIS_PROMPT = """Analyze the following address for real estate investment potential and return a JSON response with the following metrics:
+        Address: {address}
+
+        Please provide a detailed analysis and return a JSON object with the following keys and their values (all values should be between 0 and 1):
+        - property_buying_risk (0-1, where 1 is highest risk)
+        - property_renting_risk (0-1, where 1 is highest risk)
+        - flood_risk (0-1, where 1 is highest risk)
+        - crime_rate (0-1, where 1 is highest risk)
+        - air_quality_index (0-1, where 1 is best)
+        - proximity_to_amenities (0-1, where 1 is best)
+        - transportation_score (0-1, where 1 is best)
+        - neighborhood_rating (0-1, where 1 is best)
+        - environmental_hazards (0-1, where 1 is highest risk)
+        - economic_growth_potential (0-1, where 1 is highest potential)
+
+        Return ONLY the JSON object, without any explanation or formatting. No surrounding text, no markdown."""
+
+
+async def analyze_metrics(address: str) -> Dict[str, float]:
+    """
+    :param address: Free-text address.
+    :return: Risk and quality metrics of the address estimated by the LLM.
+    """
+    response = await config.llm.chat.completions.create(
+        model=config.env.azure_openai_deployment,
+        messages=[
+            {"role": "system", "content": "You are a real estate GIS analysis expert. Provide accurate and detailed analysis of locations."},
+            {"role": "user", "content": GIS_PROMPT.format(address=address)}
+        ],
+        temperature=0.7,
+        max_tokens=500
+    )
+    logging.info(response)
+    # Parse the JSON object from the model's output
+    analysis = json.loads(response.choices[0].message.content)
+    return {field: analysis.get(field) for field in METRIC_FIELDS}
+
+
+async def analyze_location(address: str, timeout_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Geocode the address and analyze it with the LLM concurrently, under one deadline.
+    A side that fails or misses the deadline is left out and the result is marked partial.
+
+    :param address: Free-text address.
+    :param timeout_seconds: Deadline of both calls, GIS_ANALYZE_TIMEOUT_SECONDS by default.
+    :return: GISResponse fields.
+    :raises TimeoutError: Neither call finished before the deadline.
+    """
+    timeout_seconds = timeout_seconds if timeout_seconds is not None else config.env.gis_analyze_timeout_seconds
+    geocoding = asyncio.create_task(geocoder.geocode(address), name="geocoding")
+    metrics = asyncio.create_task(analyze_metrics(address), name="analysis")
+    try:
+        done, pending = await asyncio.wait({geocoding, metrics}, timeout=timeout_seconds)
+    except asyncio.CancelledError:
+        geocoding.cancel()
+        metrics.cancel()
+        raise
+    for task in pending:
+        logging.warning(f"GIS {task.get_name()} of {address} missed the {timeout_seconds}s deadline")
+        task.cancel()
+    failed = [task for task in done if task.exception() is not None]
+    for task in failed:
+        logging.error(f"GIS {task.get_name()} of {address} failed: {task.exception()}")
+
+    if metrics not in done or metrics in failed:
+        if geocoding not in done or geocoding in failed or geocoding.result() is None:
+            # Nothing to return
+            if metrics in failed:
+                raise metrics.exception()
+            raise TimeoutError(f"GIS analysis did not finish within {timeout_seconds}s")
+        result: Dict[str, Any] = {field: None for field in METRIC_FIELDS}
+    else:
+        result = metrics.result()
+
+    coordinates: Optional[Coordinates] = geocoding.result() if geocoding in done and geocoding not in failed else None
+    result["coordinates"] = coordinates.model_dump() if coordinates else None
+    result["partial"] = bool(pending or failed)
+    return result
+
+
+async def ensure_gis_indexes():
+    await analyses.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    await analyses.create_index([("location", GEOSPHERE)])
+
+
+async def get_cached_analysis(key: str) -> Optional[Dict[str, Any]]:
+    """
+    :param key: Normalized address.
+    :return: Stored complete analysis of the address, or None on a miss.
+    """
+    result = analysis_cache.get(key)
+    if result is not None:
+        return result
+    entry = await analyses.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}}, {"result": 1})
+    if entry is None:
+        return None
+    analysis_cache.set(key, entry["result"])
+    return entry["result"]
+
+
+async def store_analysis(key: str, address: str, result: Dict[str, Any]):
+    analysis_cache.set(key, result)
+    now = datetime.utcnow()
+    coordinates = result.get("coordinates")
+    update = {
+        "$set": {
+            "address": address,
+            "result": result,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=config.env.gis_analysis_ttl_seconds)
+        }
+    }
+    # Only analyses with coordinates enter the spatial index
+    if coordinates:
+        update["$set"]["location"] = {"type": "Point", "coordinates": [coordinates["longitude"], coordinates["latitude"]]}
+    else:
+        update["$unset"] = {"location": ""}
+    await analyses.update_one({"_id": key}, update, upsert=True)
+
+
+async def find_nearby_analysis(coordinates: Coordinates) -> Optional[Tuple[Dict[str, Any], float, float]]:
+    """
+    Find the nearest stored analysis within GIS_REUSE_RADIUS_METERS that is at most GIS_REUSE_MAX_AGE_SECONDS old.
+
+    :param coordinates: Coordinates of the requested address.
+    :return: (analysis, distance in meters, age in seconds), or None if no analysis qualifies.
+    """
+    now = datetime.utcnow()
+    cursor = analyses.aggregate([
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [coordinates.longitude, coordinates.latitude]},
+            "distanceField": "distance",
+            "maxDistance": config.env.gis_reuse_radius_meters,
+            "spherical": True,
+            "query": {
+                "created_at": {"$gte": now - timedelta(seconds=config.env.gis_reuse_max_age_seconds)},
+                "expires_at": {"$gt": now}
+            }
+        }},
+        {"$limit": 1},
+        {"$project": {"result": 1, "distance": 1, "created_at": 1}}
+    ])
+    async for entry in cursor:
+        return entry["result"], entry["distance"], (now - entry["created_at"]).total_seconds()
+    return None
+
+
+async def geocode_location(address: str) -> Optional[Coordinates]:
+    """
+    Geocode an address for layer scoring and nearby reuse, within GIS_ANALYZE_TIMEOUT_SECONDS.
+    A geocoding that fails or misses the deadline leaves the address to the LLM analysis, which geocodes it again.
+
+    :return: Coordinates of the address, or None.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(geocoder.geocode(address)), config.env.gis_analyze_timeout_seconds)
+    except Exception as e:
+        logging.warning(f"Geocoding {address} for layer scoring and nearby reuse failed: {e!r}")
+        return None
+
+
+def score_with_layers(coordinates: Coordinates) -> Optional[Dict[str, Any]]:
+    """
+    :return: GISResponse fields computed from the local layers, or None outside their coverage.
+    """
+    metrics = gis_layers.score([coordinates])[0]
+    if metrics is None:
+        return None
+    return {
+        **{field: metrics.get(field) for field in METRIC_FIELDS},
+        "coordinates": coordinates.model_dump(),
+        "partial": False,
+        "source": "layers"
+    }
+
+
+def score_analysis(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    :return: GISResponse fields computed from the local layers at the coordinates of an analysis,
+        or None when the analysis has no coordinates or the layers do not cover them.
+    """
+    coordinates = result.get("coordinates")
+    if not gis_layers.loaded or not coordinates:
+        return None
+    return score_with_layers(Coordinates(**coordinates))
+
+
+async def reuse_nearby_analysis(coordinates: Coordinates) -> Optional[Dict[str, Any]]:
+    nearby = await find_nearby_analysis(coordinates)
+    if nearby is None:
+        return None
+    result, distance, age = nearby
+    return {
+        **result,
+        "coordinates": coordinates.model_dump(),
+        "cached": True,
+        "reused_distance_m": round(distance, 1),
+        "reused_age_seconds": round(age)
+    }
+
+
+async def analyze_address(address: str) -> Dict[str, Any]:
+    """
+    Serve the stored analysis of an address, score it from the local layers when they cover it, serve a fresh
+    analysis of a location within GIS_REUSE_RADIUS_METERS, or else analyze the address with the LLM and store
+    the result unless it is partial. The LLM is only called once the layers and nearby reuse have declined.
+    LLM analyses of locations the layers cover are never served or stored.
+
+    :param address: Free-text address.
+    :return: GISResponse fields, with `cached` set for stored analyses and the distance and age of a reused nearby one,
+        and `source` "layers" for scored ones.
+    """
+    key = normalize_address(address)
+    if not key:
+        raise ValueError("Address is empty")
+    cached = await get_cached_analysis(key)
+    if cached is not None:
+        # Analyses stored before the layers covered the location give way to the layers
+        scored = score_analysis(cached)
+        if scored is not None:
+            return scored
+        return {**cached, "cached": True}
+
+    if gis_layers.loaded or config.env.gis_reuse_radius_meters > 0:
+        coordinates = await geocode_location(address)
+        if coordinates is not None and gis_layers.loaded:
+            scored = score_with_layers(coordinates)
+            if scored is not None:
+                return scored
+        if coordinates is not None and config.env.gis_reuse_radius_meters > 0:
+            try:
+                nearby = await reuse_nearby_analysis(coordinates)
+            except Exception as e:
+                logging.warning(f"Spatial reuse lookup failed for {address}: {e}")
+                nearby = None
+            if nearby is not None:
+                return nearby
+
+    result = await analyze_location(address)
+    # Geocoding that failed above may resolve with the analysis, and the layers still take precedence
+    scored = score_analysis(result)
+    if scored is not None:
+        return scored
+    if not result["partial"]:
+        await store_analysis(key, address, result)
+    return result
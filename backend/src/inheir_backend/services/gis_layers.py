@@ -0,0 +1,149 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import box
+from ..config import AppConfig, get_config
+from ..models.gis import METRIC_FIELDS, Coordinates
+
+config: AppConfig = get_config()
+
+
+def read_layer(path: str) -> gpd.GeoDataFrame:
+    """
+    Read a GeoPackage, GeoParquet or any other OGR-readable layer. Parquet files are memory-mapped.
+    """
+    if Path(path).suffix.lower() in (".parquet", ".geoparquet"):
+        return gpd.read_parquet(path, memory_map=True)
+    return gpd.read_file(path)
+
+
+class GISLayers:
+    """
+    Deterministic location scoring from local geospatial layers, loaded once into spatially indexed frames
+    projected to a metric CRS:
+
+    - flood zones: polygons, with an optional `risk` column (0-1, 1 when missing), giving `flood_risk`
+    - amenities: points counted within `amenity_radius_meters`, giving `proximity_to_amenities`
+    - transit stops: distance to the nearest stop within `transit_radius_meters`, giving `transportation_score`
+    - zones: polygons whose columns named after GISResponse metrics give those metrics directly
+
+    Locations outside the coverage area, the coverage layer or else the bounds of the loaded layers, are not scored.
+    """
+
+    def __init__(
+        self,
+        flood_path: Optional[str],
+        amenity_path: Optional[str],
+        transit_path: Optional[str],
+        zone_path: Optional[str],
+        coverage_path: Optional[str],
+        amenity_radius_meters: float,
+        amenity_target_count: int,
+        transit_radius_meters: float
+    ):
+        self.paths = {
+            "flood": flood_path,
+            "amenity": amenity_path,
+            "transit": transit_path,
+            "zone": zone_path,
+            "coverage": coverage_path
+        }
+        self.amenity_radius_meters = amenity_radius_meters
+        self.amenity_target_count = amenity_target_count
+        self.transit_radius_meters = transit_radius_meters
+        self.layers: Dict[str, gpd.GeoDataFrame] = {}
+        self.coverage = None
+        self.crs = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.coverage is not None
+
+    def load(self):
+        """
+        Read the configured layers, project them to the UTM zone of their extent and build their spatial indexes.
+        Layers already stored in that zone are used as read, so memory-mapped Parquet layers are not copied
+        by a reprojection.
+        """
+        layers = {name: read_layer(path) for name, path in self.paths.items() if path}
+        if not layers:
+            return
+        self.crs = next(iter(layers.values())).estimate_utm_crs()
+        for name, layer in layers.items():
+            if layer.crs != self.crs:
+                layer = layer.to_crs(self.crs)
+            # Building the STRtree up front keeps the first request fast
+            layer.sindex
+            self.layers[name] = layer
+            logging.info(f"Loaded GIS {name} layer with {len(layer)} features")
+
+        if "coverage" in self.layers:
+            self.coverage = self.layers.pop("coverage").union_all()
+        else:
+            bounds = np.array([layer.total_bounds for layer in self.layers.values()])
+            self.coverage = box(bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+
+    def score(self, coordinates: List[Coordinates]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Score locations with vectorized spatial index queries.
+
+        :param coordinates: Locations to score.
+        :return: Metrics of each location, or None for locations outside the coverage area.
+        """
+        points = gpd.GeoSeries(
+            gpd.points_from_xy([c.longitude for c in coordinates], [c.latitude for c in coordinates]), crs=4326
+        ).to_crs(self.crs)
+        covered = points.within(self.coverage).to_numpy()
+        results: List[Dict[str, Any]] = [{} for _ in coordinates]
+
+        flood = self.layers.get("flood")
+        if flood is not None:
+            risks = flood["risk"].to_numpy(dtype=float) if "risk" in flood else np.ones(len(flood))
+            flood_risk = np.zeros(len(points))
+            point_idx, zone_idx = flood.sindex.query(points, predicate="intersects")
+            np.maximum.at(flood_risk, point_idx, risks[zone_idx])
+            for idx, risk in enumerate(flood_risk):
+                results[idx]["flood_risk"] = float(risk)
+
+        amenities = self.layers.get("amenity")
+        if amenities is not None:
+            point_idx, _ = amenities.sindex.query(points, predicate="dwithin", distance=self.amenity_radius_meters)
+            counts = np.bincount(point_idx, minlength=len(points))
+            for idx, count in enumerate(counts):
+                results[idx]["proximity_to_amenities"] = float(min(count / self.amenity_target_count, 1.0))
+
+        transit = self.layers.get("transit")
+        if transit is not None:
+            nearest = np.full(len(points), np.inf)
+            (point_idx, _), distances = transit.sindex.nearest(
+                points, max_distance=self.transit_radius_meters, return_distance=True, return_all=False
+            )
+            nearest[point_idx] = distances
+            for idx, distance in enumerate(nearest):
+                results[idx]["transportation_score"] = float(max(0.0, 1 - distance / self.transit_radius_meters))
+
+        zones = self.layers.get("zone")
+        if zones is not None:
+            point_idx, zone_idx = zones.sindex.query(points, predicate="intersects", sort=True)
+            for metric in [column for column in zones.columns if column in METRIC_FIELDS]:
+                values = zones[metric].to_numpy(dtype=float)
+                # The first zone containing a point provides its metrics; layer-derived metrics are kept
+                for idx, zone in zip(point_idx, zone_idx):
+                    if metric not in results[idx] and not np.isnan(values[zone]):
+                        results[idx][metric] = float(values[zone])
+
+        return [result if is_covered else None for result, is_covered in zip(results, covered)]
+
+
+gis_layers = GISLayers(
+    config.env.gis_flood_layer_path,
+    config.env.gis_amenity_layer_path,
+    config.env.gis_transit_layer_path,
+    config.env.gis_zone_layer_path,
+    config.env.gis_coverage_layer_path,
+    config.env.gis_amenity_radius_meters,
+    config.env.gis_amenity_target_count,
+    config.env.gis_transit_radius_meters
+)
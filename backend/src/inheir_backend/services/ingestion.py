@@ -0,0 +1,157 @@
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional
+from azure.storage.blob import BlobProperties
+from ..config import AppConfig, get_config
+from ..helpers.concurrency import gather_bounded
+from .rag import extract_blob_text
+from .search_index import delete_search_documents, get_blob_key, make_chunk_documents, upload_search_documents
+from .local_search import local_search
+
+config: AppConfig = get_config()
+
+CHECKPOINT_ID = "knowledge_base"
+
+
+class IngestionReport:
+    """
+    Counters of a knowledge-base ingestion run.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.listed = 0
+        self.skipped = 0
+        self.indexed = 0
+        self.failed = 0
+        self.chunks = 0
+
+    def to_dict(self) -> dict:
+        seconds = time.perf_counter() - self.started
+        return {
+            "listed": self.listed,
+            "skipped": self.skipped,
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "seconds": round(seconds, 2),
+            "documents_per_second": round(self.indexed / seconds, 2) if seconds else 0.0,
+            "chunks_per_second": round(self.chunks / seconds, 2) if seconds else 0.0
+        }
+
+
+def is_unchanged(blob: BlobProperties, state: Optional[dict]) -> bool:
+    if not state or state.get("status") not in ("indexed", "unsupported"):
+        return False
+    digest = (blob.metadata or {}).get("sha256")
+    return state.get("etag") == blob.etag or (digest is not None and state.get("sha256") == digest)
+
+
+async def extract_blob_documents(blob: BlobProperties) -> Optional[List[dict]]:
+    """
+    :return: Search documents of the blob's chunks, or None for unsupported content types.
+    """
+    file_path = f"{config.env.knowledge_base_endpoint}{blob.name}"
+    metadata = blob.metadata or {}
+    text = await extract_blob_text(config.knowledge_base, file_path, metadata)
+    if text is None:
+        return None
+    return make_chunk_documents(blob.name, file_path, metadata.get("filename"), text)
+
+
+async def ingest_blobs(blobs: List[BlobProperties], report: IngestionReport, force: bool = False):
+    """
+    Extract, chunk and index a page of knowledge-base blobs, skipping blobs indexed before with the same
+    ETag or content hash, and record the state of each blob.
+
+    :param blobs: Listed blobs with metadata.
+    :param report: Report to update.
+    :param force: Re-index blobs even when unchanged.
+    """
+    state_collection = config.db["kb_ingestion"]
+    states = {
+        state["_id"]: state
+        async for state in state_collection.find({"_id": {"$in": [blob.name for blob in blobs]}})
+    }
+    pending = [blob for blob in blobs if force or not is_unchanged(blob, states.get(blob.name))]
+    report.listed += len(blobs)
+    report.skipped += len(blobs) - len(pending)
+
+    results = await gather_bounded(pending, extract_blob_documents, config.env.kb_ingestion_concurrency)
+    extracted = {}
+    now = datetime.utcnow()
+    for blob, (documents, error) in zip(pending, results):
+        state = {"etag": blob.etag, "sha256": (blob.metadata or {}).get("sha256"), "updated_at": now}
+        if error is not None:
+            logging.error(f"Could not extract knowledge base blob {blob.name}: {error}")
+            report.failed += 1
+            await state_collection.update_one({"_id": blob.name}, {"$set": {**state, "status": "failed", "error": str(error)}}, upsert=True)
+        elif documents is None:
+            await state_collection.update_one({"_id": blob.name}, {"$set": {**state, "status": "unsupported"}}, upsert=True)
+        else:
+            extracted[blob.name] = (blob, documents, state)
+
+    failures = await upload_search_documents([
+        document for _, documents, _ in extracted.values() for document in documents
+    ])
+    failed_keys = {key.rsplit("-", 1)[0] for key in failures}
+
+    for blob_name, (blob, documents, state) in extracted.items():
+        if get_blob_key(blob_name) in failed_keys:
+            report.failed += 1
+            await state_collection.update_one({"_id": blob_name}, {"$set": {**state, "status": "failed", "error": "Search indexing failed"}}, upsert=True)
+            continue
+        # Remove the chunks of an earlier, longer version of the document
+        previous_chunks = (states.get(blob_name) or {}).get("chunk_count", 0)
+        stale_keys = [f"{get_blob_key(blob_name)}-{idx}" for idx in range(len(documents), previous_chunks)]
+        await delete_search_documents(stale_keys)
+        # Feed the in-process BM25 index and the chunk store other workers refresh from
+        await local_search.upsert_chunks(documents)
+        await local_search.remove_chunks(stale_keys)
+        await state_collection.update_one(
+            {"_id": blob_name},
+            {"$set": {**state, "status": "indexed", "chunk_count": len(documents), "error": None}},
+            upsert=True
+        )
+        report.indexed += 1
+        report.chunks += len(documents)
+
+
+async def ingest_knowledge_base(resume: bool = True, force: bool = False) -> dict:
+    """
+    Incrementally index the knowledge base container into Azure AI Search.
+    The listing position is checkpointed after every page, so an interrupted run resumes where it stopped.
+
+    :param resume: Continue from the checkpoint of an interrupted run.
+    :param force: Re-index blobs even when unchanged.
+    :return: Ingestion report with documents per second.
+    """
+    checkpoints = config.db["kb_ingestion_runs"]
+    checkpoint = await checkpoints.find_one({"_id": CHECKPOINT_ID}) if resume else None
+    continuation_token = (checkpoint or {}).get("continuation_token")
+    if continuation_token:
+        logging.info("Resuming knowledge base ingestion from checkpoint")
+
+    report = IngestionReport()
+    pages = config.knowledge_base.list_blobs(
+        include=["metadata"], results_per_page=config.env.kb_ingestion_page_size
+    ).by_page(continuation_token=continuation_token)
+    async for page in pages:
+        blobs = [blob async for blob in page]
+        await ingest_blobs(blobs, report, force)
+        await checkpoints.update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$set": {"continuation_token": pages.continuation_token, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        logging.info(f"Knowledge base ingestion progress: {report.to_dict()}")
+
+    result = report.to_dict()
+    await checkpoints.update_one(
+        {"_id": CHECKPOINT_ID},
+        {"$set": {"continuation_token": None, "completed_at": datetime.utcnow(), "report": result}},
+        upsert=True
+    )
+    logging.info(f"Knowledge base ingestion completed: {result}")
+    return result
@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorCollection
+from ..config import AppConfig, get_config
+
+config: AppConfig = get_config()
+
+
+class PermanentJobError(Exception):
+    """
+    Raised by a job handler when retrying the job cannot succeed.
+    """
+
+
+class MongoJobQueue:
+    """
+    Job queue backed by a MongoDB collection. Jobs are claimed with a lease that the worker renews
+    while it runs the job, so jobs held by a worker that died are picked up again once the lease
+    expires, until they run out of attempts.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, lease_seconds: int = 300):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+        await self.collection.create_index([("case_id", ASCENDING)])
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], case_id: Optional[str] = None) -> str:
+        now = datetime.utcnow()
+        job = {
+            "kind": kind,
+            "payload": payload,
+            "case_id": case_id,
+            "status": "queued",
+            "stage": "queued",
+            "attempts": 0,
+            "error": None,
+            "lease_until": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await self.collection.insert_one(job)
+        return str(result.inserted_id)
+
+    async def claim(self, max_attempts: int) -> Optional[dict]:
+        """
+        Claim the oldest queued job, or a running job whose lease expired and that has attempts left.
+
+        :param max_attempts: Attempts after which an abandoned job is no longer claimed.
+        :return: Claimed job with a new `lease_token`, or None.
+        """
+        now = datetime.utcnow()
+        job = await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": max_attempts}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "lease_token": uuid4().hex,
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            job["job_id"] = str(job.pop("_id"))
+        return job
+
+    async def renew(self, job_id: str, lease_token: str) -> bool:
+        """
+        Extend the lease of a running job, unless another worker claimed it since.
+        """
+        now = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"_id": ObjectId(job_id), "status": "running", "lease_token": lease_token},
+            {"$set": {"lease_until": now + timedelta(seconds=self.lease_seconds), "updated_at": now}}
+        )
+        return result.modified_count > 0
+
+    async def fail_abandoned(self, max_attempts: int) -> List[dict]:
+        """
+        Fail running jobs whose lease expired on their last attempt, e.g. because they crashed their worker.
+
+        :return: Jobs marked failed.
+        """
+        failed = []
+        while True:
+            now = datetime.utcnow()
+            job = await self.collection.find_one_and_update(
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": max_attempts}},
+                {"$set": {
+                    "status": "failed",
+                    "stage": "failed",
+                    "error": "Job lease expired on its last attempt",
+                    "lease_until": None,
+                    "updated_at": now
+                }},
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return failed
+            job["job_id"] = str(job.pop("_id"))
+            failed.append(job)
+
+    async def set_stage(self, job_id: str, stage: str):
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": ObjectId(job_id)},
+            {"$set": {
+                "stage": stage,
+                "lease_until": now + timedelta(seconds=self.lease_seconds),
+                "updated_at": now
+            }}
+        )
+
+    async def complete(self, job_id: str):
+        await self.collection.update_one(
+            {"_id": ObjectId(job_id)},
+            {"$set": {"status": "completed", "stage": "completed", "lease_until": None, "updated_at": datetime.utcnow()}}
+        )
+
+    async def fail(self, job_id: str, error: str, retry: bool):
+        status = "queued" if retry else "failed"
+        update = {"status": status, "error": error, "lease_until": None, "updated_at": datetime.utcnow()}
+        if not retry:
+            update["stage"] = "failed"
+        await self.collection.update_one({"_id": ObjectId(job_id)}, {"$set": update})
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await self.collection.find_one({"_id": ObjectId(job_id)})
+        if job:
+            job["job_id"] = str(job.pop("_id"))
+        return job
+
+    async def find_by_case(self, case_id: str) -> Optional[dict]:
+        job = await self.collection.find_one({"case_id": case_id}, sort=[("created_at", -1)])
+        if job:
+            job["job_id"] = str(job.pop("_id"))
+        return job
+
+
+class InMemoryJobQueue:
+    """
+    Local stand-in for MongoJobQueue, for tests and single-process development.
+    Jobs do not survive restarts.
+    """
+
+    def __init__(self, lease_seconds: int = 300):
+        self.jobs: Dict[str, dict] = {}
+        self.lease_seconds = lease_seconds
+
+    async def ensure_indexes(self):
+        pass
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any], case_id: Optional[str] = None) -> str:
+        job_id = uuid4().hex
+        now = datetime.utcnow()
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "kind": kind,
+            "payload": payload,
+            "case_id": case_id,
+            "status": "queued",
+            "stage": "queued",
+            "attempts": 0,
+            "error": None,
+            "lease_until": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        return job_id
+
+    async def claim(self, max_attempts: int) -> Optional[dict]:
+        now = datetime.utcnow()
+        for job in sorted(self.jobs.values(), key=lambda job: job["created_at"]):
+            expired = job["status"] == "running" and job["lease_until"] < now and job["attempts"] < max_attempts
+            if job["status"] == "queued" or expired:
+                job["status"] = "running"
+                job["lease_until"] = now + timedelta(seconds=self.lease_seconds)
+                job["lease_token"] = uuid4().hex
+                job["attempts"] += 1
+                job["updated_at"] = now
+                return dict(job)
+        return None
+
+    async def renew(self, job_id: str, lease_token: str) -> bool:
+        job = self.jobs[job_id]
+        if job["status"] != "running" or job.get("lease_token") != lease_token:
+            return False
+        job["lease_until"] = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        job["updated_at"] = datetime.utcnow()
+        return True
+
+    async def fail_abandoned(self, max_attempts: int) -> List[dict]:
+        now = datetime.utcnow()
+        failed = []
+        for job in self.jobs.values():
+            if job["status"] == "running" and job["lease_until"] < now and job["attempts"] >= max_attempts:
+                job.update({
+                    "status": "failed",
+                    "stage": "failed",
+                    "error": "Job lease expired on its last attempt",
+                    "lease_until": None,
+                    "updated_at": now
+                })
+                failed.append(dict(job))
+        return failed
+
+    async def set_stage(self, job_id: str, stage: str):
+        job = self.jobs[job_id]
+        job["stage"] = stage
+        job["lease_until"] = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        job["updated_at"] = datetime.utcnow()
+
+    async def complete(self, job_id: str):
+        self.jobs[job_id].update({"status": "completed", "stage": "completed", "lease_until": None, "updated_at": datetime.utcnow()})
+
+    async def fail(self, job_id: str, error: str, retry: bool):
+        job = self.jobs[job_id]
+        job.update({"status": "queued" if retry else "failed", "error": error, "lease_until": None, "updated_at": datetime.utcnow()})
+        if not retry:
+            job["stage"] = "failed"
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def find_by_case(self, case_id: str) -> Optional[dict]:
+        jobs = [job for job in self.jobs.values() if job["case_id"] == case_id]
+        if not jobs:
+            return None
+        return dict(max(jobs, key=lambda job: job["created_at"]))
+
+
+JobHandler = Callable[[dict, Callable[[str], Awaitable[None]]], Awaitable[None]]
+FailureHandler = Callable[[dict, str], Awaitable[None]]
+
+
+class JobWorkerPool:
+    """
+    Pool of asyncio workers that claim jobs from a queue and run them through a handler.
+    The lease of a running job is renewed every third of the queue's lease, and jobs abandoned
+    on their last attempt are failed by the next worker that polls.
+    """
+
+    def __init__(
+        self,
+        queue,
+        handler: JobHandler,
+        concurrency: int,
+        max_attempts: int = 3,
+        poll_interval: float = 1.0,
+        on_failure: Optional[FailureHandler] = None
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.on_failure = on_failure
+        self.workers: List[asyncio.Task] = []
+        self.next_sweep = 0.0
+
+    async def start(self):
+        await self.queue.ensure_indexes()
+        self.workers = [asyncio.create_task(self.work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def run_job(self, job: dict):
+        job_id = job["job_id"]
+
+        async def set_stage(stage: str):
+            await self.queue.set_stage(job_id, stage)
+
+        heartbeat = asyncio.create_task(self.renew_lease(job))
+        try:
+            await self.handler(job, set_stage)
+            await self.queue.complete(job_id)
+        except Exception as e:
+            retry = not isinstance(e, PermanentJobError) and job["attempts"] < self.max_attempts
+            logging.error(f"Job {job_id} failed on attempt {job['attempts']}: {e}")
+            await self.queue.fail(job_id, str(e), retry)
+            if not retry and self.on_failure:
+                await self.on_failure(job, str(e))
+        finally:
+            heartbeat.cancel()
+
+    async def renew_lease(self, job: dict):
+        interval = self.queue.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.queue.renew(job["job_id"], job["lease_token"]):
+                    logging.warning(f"Job {job['job_id']} lease was lost to another worker")
+                    return
+            except Exception as e:
+                logging.error(f"Error renewing lease of job {job['job_id']}: {e}")
+
+    async def fail_abandoned(self):
+        if time.monotonic() < self.next_sweep:
+            return
+        self.next_sweep = time.monotonic() + self.queue.lease_seconds / 3
+        for job in await self.queue.fail_abandoned(self.max_attempts):
+            logging.error(f"Job {job['job_id']} failed: {job['error']}")
+            if self.on_failure:
+                await self.on_failure(job, job["error"])
+
+    async def work(self):
+        while True:
+            try:
+                await self.fail_abandoned()
+                job = await self.queue.claim(self.max_attempts)
+            except Exception as e:
+                logging.error(f"Error claiming job: {e}")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.run_job(job)
+
+
+def get_case_job_queue():
+    if config.env.case_job_queue == "memory":
+        return InMemoryJobQueue(config.env.case_job_lease_seconds)
+    return MongoJobQueue(config.db["case_jobs"], config.env.case_job_lease_seconds)
+
+
+case_job_queue = get_case_job_queue()
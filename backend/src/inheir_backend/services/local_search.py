@@ -0,0 +1,99 @@
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional
+from pymongo import ASCENDING, UpdateOne
+from motor.motor_asyncio import AsyncIOMotorCollection
+from ..config import AppConfig, get_config
+from ..helpers.bm25 import BM25Index
+
+config: AppConfig = get_config()
+
+
+class LocalSearch:
+    """
+    In-process BM25 retriever over the knowledge base chunks.
+
+    Ingestion writes every indexed chunk to the `kb_chunks` collection and applies it to the
+    local index; other workers pick up changes incrementally, at most every `refresh_seconds`.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, refresh_seconds: int):
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        self.index = BM25Index()
+        self.synced_at: Optional[datetime] = None
+        self.refreshed = 0.0
+        self.indexed = False
+
+    async def ensure_indexes(self):
+        if not self.indexed:
+            await self.collection.create_index([("updated_at", ASCENDING)])
+            self.indexed = True
+
+    async def upsert_chunks(self, documents: List[dict]):
+        """
+        :param documents: Search documents from ingestion, with "id" and "content".
+        """
+        if not documents:
+            return
+        await self.ensure_indexes()
+        now = datetime.utcnow()
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": document["id"]},
+                {"$set": {
+                    "content": document["content"],
+                    "metadata_filename": document.get("metadata_filename"),
+                    "metadata_file_path": document.get("metadata_file_path"),
+                    "deleted": False,
+                    "updated_at": now
+                }},
+                upsert=True
+            )
+            for document in documents
+        ])
+        self.index.add_many((document["id"], document["content"]) for document in documents)
+
+    async def remove_chunks(self, keys: List[str]):
+        if not keys:
+            return
+        await self.collection.update_many(
+            {"_id": {"$in": keys}},
+            {"$set": {"deleted": True, "content": "", "updated_at": datetime.utcnow()}}
+        )
+        for key in keys:
+            self.index.remove(key)
+
+    async def refresh(self, force: bool = False):
+        """
+        Apply chunks added or removed since the last refresh.
+        """
+        if not force and time.monotonic() - self.refreshed < self.refresh_seconds:
+            return
+        self.refreshed = time.monotonic()
+        chunk_filter = {"updated_at": {"$gte": self.synced_at}} if self.synced_at else {"deleted": {"$ne": True}}
+        cursor = self.collection.find(chunk_filter, {"content": 1, "deleted": 1, "updated_at": 1})
+        changed = 0
+        async for chunk in cursor:
+            if chunk.get("deleted"):
+                self.index.remove(chunk["_id"])
+            else:
+                self.index.add(chunk["_id"], chunk["content"])
+            if self.synced_at is None or chunk["updated_at"] > self.synced_at:
+                self.synced_at = chunk["updated_at"]
+            changed += 1
+        if changed:
+            logging.info(f"Local search index refreshed with {changed} chunks, {len(self.index)} total")
+
+    async def search(self, query: str, top: int) -> List[str]:
+        """
+        :param query: Free-text query.
+        :param top: Maximum number of results.
+        :return: Content of the best matching chunks, best first.
+        """
+        await self.refresh()
+        return [content for _, content, _ in self.index.search(query, top)]
+
+
+local_search = LocalSearch(config.db["kb_chunks"], config.env.kb_local_refresh_seconds)
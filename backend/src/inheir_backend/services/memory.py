@@ -0,0 +1,128 @@
+import logging
+from datetime import datetime
+from typing import List, Optional
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from ..config import AppConfig, get_config
+
+config: AppConfig = get_config()
+
+
+memory_summary_template = """\
+You maintain a running summary of a conversation between a user and a legal assistant about a legal case.
+
+Current summary:
+{summary}
+
+Older turns to fold into the summary:
+{turns}
+
+Write the updated summary in at most {max_words} words. Keep facts the user stated, questions asked, \
+conclusions reached and anything the user may refer back to. Drop pleasantries and repetition.
+"""
+
+memory_summary_prompt_template = ChatPromptTemplate.from_template(memory_summary_template)
+
+
+class ConversationMemory:
+    """
+    Rolling summary of older turns plus the most recent turns of a case chat, verbatim.
+    """
+
+    def __init__(self, summary: str = "", turns: Optional[List[dict]] = None):
+        self.summary = summary
+        self.turns = turns or []
+
+    def is_empty(self) -> bool:
+        return not self.summary and not self.turns
+
+    def format(self) -> str:
+        if self.is_empty():
+            return "None"
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.turns:
+            parts.append("Recent turns:\n" + format_turns(self.turns))
+        return "\n\n".join(parts)
+
+
+def format_turns(turns: List[dict]) -> str:
+    return "\n".join(
+        f"User: {turn['query']['content']}\nAssistant: {turn['response']['content']}"
+        for turn in turns
+    )
+
+
+def get_memory_id(user_id: str, case_id: str) -> str:
+    return f"{user_id}:{case_id}"
+
+
+def get_unsummarized_filter(user_id: str, case_id: str, memory_doc: Optional[dict]) -> dict:
+    turn_filter = {"user_id": user_id, "case_id": case_id}
+    if memory_doc and memory_doc.get("summarized_through"):
+        turn_filter["_id"] = {"$gt": memory_doc["summarized_through"]}
+    return turn_filter
+
+
+async def load_memory(user_id: str, case_id: str) -> ConversationMemory:
+    """
+    Load the rolling summary and the last CHAT_MEMORY_TURNS turns of a case chat.
+
+    :param user_id: User the chat belongs to.
+    :param case_id: Case the chat is about.
+    :return: Conversation memory, empty for a new chat.
+    """
+    memory_doc = await config.db["chat_memory"].find_one({"_id": get_memory_id(user_id, case_id)})
+    cursor = config.db["chat_history"].find(
+        get_unsummarized_filter(user_id, case_id, memory_doc),
+        {"query": 1, "response": 1}
+    ).sort("_id", DESCENDING).limit(config.env.chat_memory_turns)
+    turns = await cursor.to_list(length=config.env.chat_memory_turns)
+    return ConversationMemory((memory_doc or {}).get("summary", ""), list(reversed(turns)))
+
+
+async def update_memory(user_id: str, case_id: str):
+    """
+    Fold the turns that no longer fit the verbatim window into the rolling summary.
+    Runs after a turn is stored; the summary is only recomputed when the window overflows.
+
+    :param user_id: User the chat belongs to.
+    :param case_id: Case the chat is about.
+    """
+    memory_collection = config.db["chat_memory"]
+    memory_id = get_memory_id(user_id, case_id)
+    try:
+        memory_doc = await memory_collection.find_one({"_id": memory_id})
+        turn_filter = get_unsummarized_filter(user_id, case_id, memory_doc)
+        overflow = await config.db["chat_history"].count_documents(turn_filter) - config.env.chat_memory_turns
+        if overflow <= 0:
+            return
+
+        cursor = config.db["chat_history"].find(turn_filter, {"query": 1, "response": 1}).sort("_id", ASCENDING).limit(overflow)
+        turns = await cursor.to_list(length=overflow)
+        summary_chain = memory_summary_prompt_template | config.langchain_llm | StrOutputParser()
+        summary = await summary_chain.ainvoke({
+            "summary": (memory_doc or {}).get("summary") or "None",
+            "turns": format_turns(turns),
+            "max_words": config.env.chat_memory_summary_words
+        })
+
+        # Only apply the new summary if no other worker folded the same turns first
+        await memory_collection.update_one(
+            {"_id": memory_id, "summarized_through": (memory_doc or {}).get("summarized_through")},
+            {"$set": {
+                "user_id": user_id,
+                "case_id": case_id,
+                "summary": summary.strip(),
+                "summarized_through": turns[-1]["_id"],
+                "updated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        logging.info(f"Conversation memory for case {case_id} was updated concurrently")
+    except Exception as e:
+        logging.error(f"Could not update conversation memory for case {case_id}: {e}")
@@ -1,64 +1,177 @@
+import asyncio
 import os
 import logging
 import mimetypes
 import json
 from datetime import datetime
-from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.search.documents import SearchClient
+from typing import Dict, List, Optional
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError
+from azure.storage.blob.aio import ContainerClient
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
 from langchain_community.callbacks import get_openai_callback
 from inheir_backend.config import get_config, AppConfig
+from ..helpers.filename import get_content_hash
+from .extraction_cache import extraction_cache
+from .text_layer import count_pdf_pages, extract_text_layer, extraction_metrics, format_page_ranges
+from ..helpers.concurrency import gather_bounded
+from .search_index import make_chunk_documents, upload_search_documents
+from .local_search import local_search
 
 config: AppConfig = get_config()
 
 
-def process_upload_document(file_path: str):
+async def analyze_document_pages(file_path: str, pages: Optional[str] = None) -> Dict[int, str]:
     """
-    Process the document from the given file path using Azure Form Recognizer (Document Intelligence).
+    Analyze a document with Azure Document Intelligence and return its text per page.
 
-    :param file_path: Path to the file (local or URL to the Blob).
-    :return: Extracted content from the document.
+    :param file_path: URL to the Blob.
+    :param pages: Optional page range to analyze, e.g. "1-3,5". Defaults to all pages.
+    :return: Extracted text keyed by 1-based page number.
+    """
+    kwargs = {"pages": pages} if pages else {}
+    poller = await config.document_analysis_client.begin_analyze_document_from_url(
+        "prebuilt-layout", file_path, **kwargs)
+    result = await poller.result()
+
+    # Loop through the pages and extract text lines
+    return {page.page_number: "\n".join(line.content for line in page.lines) for page in result.pages}
+
+
+async def analyze_page_range(file_path: str, page_numbers: List[int], digest: str) -> Dict[int, str]:
+    """
+    Analyze one page range with retries, saving the page results as soon as the range completes.
+    """
+    retries = config.env.ocr_range_retries
+    for attempt in range(retries + 1):
+        try:
+            pages = await analyze_document_pages(file_path, format_page_ranges(page_numbers))
+            break
+        except Exception as e:
+            if attempt == retries:
+                raise
+            logging.warning(f"Retrying pages {format_page_ranges(page_numbers)} of {file_path}: {e}")
+            await asyncio.sleep(2 ** attempt)
+    await extraction_cache.put_partial_pages(digest, pages)
+    return pages
+
+
+async def analyze_scanned_pages(file_path: str, page_numbers: List[int], digest: str) -> Dict[int, str]:
+    """
+    Analyze the given pages with Document Intelligence. Large documents are split into page ranges
+    analyzed in parallel; ranges completed by an earlier attempt are not analyzed again.
+
+    :param file_path: URL to the Blob.
+    :param page_numbers: 1-based page numbers to analyze.
+    :param digest: SHA-256 of the document, used to save partial results.
+    :return: Extracted text keyed by page number.
+    """
+    pages = await extraction_cache.get_partial_pages(digest, page_numbers)
+    pending = [number for number in page_numbers if number not in pages]
+    size = config.env.ocr_range_pages
+    ranges = [pending[i:i + size] for i in range(0, len(pending), size)]
+
+    results = await gather_bounded(
+        ranges,
+        lambda page_range: analyze_page_range(file_path, page_range, digest),
+        config.env.ocr_range_concurrency
+    )
+    for result, error in results:
+        if error is not None:
+            raise error
+        pages.update(result)
+    return pages
+
+
+async def extract_document_pages(file_path: str, content_type: str, blob_data: Optional[bytes], digest: str) -> List[str]:
+    """
+    Extract the text of a document per page. Born-digital PDF pages are read from the embedded
+    text layer, and only scanned pages and images are sent to Document Intelligence.
+
+    :param file_path: URL to the Blob.
+    :param content_type: MIME type of the document.
+    :param blob_data: Document content, required for PDFs.
+    :param digest: SHA-256 of the document.
+    :return: Extracted text of each page.
+    """
+    local_pages = []
+    if content_type == "application/pdf" and blob_data:
+        if config.env.text_layer_enabled:
+            local_pages = await asyncio.to_thread(extract_text_layer, blob_data, config.env.text_layer_min_chars)
+        else:
+            local_pages = [None] * await asyncio.to_thread(count_pdf_pages, blob_data)
+
+    if not local_pages:
+        remote_pages = await analyze_document_pages(file_path)
+        extraction_metrics.record(0, len(remote_pages))
+        return list(remote_pages.values())
+
+    scanned = [number for number, text in enumerate(local_pages, start=1) if text is None]
+    remote_pages = await analyze_scanned_pages(file_path, scanned, digest) if scanned else {}
+    extraction_metrics.record(len(local_pages) - len(scanned), len(scanned))
+    logging.info(f"Extracted {len(local_pages) - len(scanned)} pages locally and {len(scanned)} with OCR: {extraction_metrics.stats()}")
+    return [
+        text if text is not None else remote_pages.get(number, "")
+        for number, text in enumerate(local_pages, start=1)
+    ]
+
+
+async def extract_blob_text(container: ContainerClient, file_path: str, metadata: Optional[dict] = None) -> Optional[str]:
     """
+    Extract the text of a blob. Documents whose content was extracted before are served from the extraction cache.
 
+    :param container: Container holding the blob.
+    :param file_path: URL to the Blob.
+    :param metadata: Blob metadata, fetched from the blob when not given.
+    :return: Extracted text, or None for unsupported content types.
+    """
     file_name = file_path.split("/")[-1]
-    blob_client = config.uploads.get_blob_client(file_name)
-    properties = blob_client.get_blob_properties()
+    blob_client = container.get_blob_client(file_name)
+    if metadata is None:
+        metadata = (await blob_client.get_blob_properties()).metadata
     content_type, _ = mimetypes.guess_type(file_path)
 
-    metadata = properties.metadata
-    filename = metadata.get("filename")
-    blob_id = metadata.get("id")
+    if content_type in ["application/pdf", "image/png", "image/jpeg"]:
+        blob_data = None
+        digest = metadata.get("sha256")
+        if digest is None:
+            blob_data = await (await blob_client.download_blob()).readall()
+            digest = get_content_hash(blob_data)
 
-    # Process the document using Azure Document Intelligence (Form Recognizer)
-    try:
-        if content_type in ["application/pdf", "image/png", "image/jpeg"]:
-            poller = config.document_analysis_client.begin_analyze_document_from_url(
-                "prebuilt-layout", file_path)
-            result = poller.result()
-
-            # Loop through the pages and extract text lines
-            extracted_text = []
-            for page in result.pages:
-                for line in page.lines:
-                    extracted_text.append(line.content)
-
-            # Return the extracted content as a list of lines
-            return "\n".join(extracted_text)
-        elif content_type == "text/plain":
-            blob_data = blob_client.download_blob().readall().decode("utf-8")
-            return  blob_data
-        else:
-            return None
-    except Exception as e:
-        logging.error(f"Error processing the document: {e}")
+        pages = await extraction_cache.get(digest)
+        if pages is None:
+            if content_type == "application/pdf" and blob_data is None:
+                blob_data = await (await blob_client.download_blob()).readall()
+            pages = await extract_document_pages(file_path, content_type, blob_data, digest)
+            await extraction_cache.put(digest, pages)
+
+        return "\n".join(pages)
+    elif content_type == "text/plain":
+        return (await (await blob_client.download_blob()).readall()).decode("utf-8")
+    else:
         return None
 
 
+async def process_upload_document(file_path: str):
+    """
+    Process the document from the given file path using Azure Form Recognizer (Document Intelligence).
+    Transient errors, e.g. a page range that failed all its retries, are raised so the caller can retry.
+
+    :param file_path: Path to the file (local or URL to the Blob).
+    :return: Extracted content from the document, or None if the document cannot be read.
+    """
+    try:
+        return await extract_blob_text(config.uploads, file_path)
+    except HttpResponseError as e:
+        # Document Intelligence rejects corrupt and unsupported files with a client error
+        if e.status_code in (400, 415):
+            logging.error(f"Document could not be read: {e}")
+            return None
+        raise
+
 
-def process_document(file_path: str):
+async def process_document(file_path: str):
     """
     Process the document from the given file path using Azure Form Recognizer (Document Intelligence).
 
@@ -68,67 +181,77 @@ def process_document(file_path: str):
 
     file_name = file_path.split("/")[-1]
     blob_client = config.knowledge_base.get_blob_client(file_name)
-    properties = blob_client.get_blob_properties()
-    content_type, _ = mimetypes.guess_type(file_path)
+    properties = await blob_client.get_blob_properties()
 
     metadata = properties.metadata
     filename = metadata.get("filename")
     blob_id = metadata.get("id")
 
-    # Process the document using Azure Document Intelligence (Form Recognizer)
     try:
-        if content_type in ["application/pdf", "image/png", "image/jpeg"]:
-            poller = config.document_analysis_client.begin_analyze_document_from_url(
-                "prebuilt-layout", file_path)
-            result = poller.result()
-
-            # Loop through the pages and extract text lines
-            extracted_text = []
-            for page in result.pages:
-                for line in page.lines:
-                    extracted_text.append(line.content)
-
-            # Return the extracted content as a list of lines
-            return {"id": blob_id, "updated": str(datetime.now()), "content": "\n".join(extracted_text), "metadata_file_path": file_path, "metadata_filename": filename}
-        elif content_type == "text/plain":
-            blob_data = blob_client.download_blob().readall().decode("utf-8")
-            return {"id": blob_id, "content": blob_data, "username": username, "metadata_file_path": file_path, "metadata_filename": filename}
-        else:
+        content = await extract_blob_text(config.knowledge_base, file_path, metadata)
+        if content is None:
             return None
+        return {"id": blob_id, "updated": str(datetime.now()), "content": content, "metadata_file_path": file_path, "metadata_filename": filename}
     except Exception as e:
         logging.error(f"Error processing the document: {e}")
         return None
 
 
-def ingest_document(file_path: str):
+async def ingest_document(file_path: str):
     """
-    Ingest the document from the given file path by processing and uploading it to the RAG container.
+    Ingest the document from the given file path by processing, chunking and uploading it to the search index.
 
     :param file_path: Path to the file (local or URL to the Blob).
     :return: The status of the ingestion process.
     """
-    processed_content = process_document(file_path)
-    if processed_content:
-        index_result = config.search.upload_documents([processed_content])
+    processed_content = await process_document(file_path)
+    if not processed_content:
         return {"status": "error", "message": "Failed to process the document."}
 
-    else:
-        return {"status": "error", "message": "Failed to process the document."}
+    blob_name = file_path.split("/")[-1]
+    documents = make_chunk_documents(blob_name, file_path, processed_content["metadata_filename"], processed_content["content"])
+    failures = await upload_search_documents(documents)
+    if failures:
+        return {"status": "error", "message": f"Failed to index {len(failures)} of {len(documents)} chunks."}
+    await local_search.upsert_chunks(documents)
+    return {"status": "success", "chunks": len(documents)}
 
 
-def search_documents(query: str):
-    results = config.search.search(
+async def search_remote_documents(query: str, top: int) -> List[str]:
+    results = await config.search.search(
         search_text=query,
         # query_type="semantic",
-        top=3
+        top=top
     )
     documents = []
-    for result in results:
+    async for result in results:
         documents.append(result["content"])
+    return documents
+
+
+async def search_documents(query: str):
+    """
+    Retrieve knowledge base chunks for a query. KB_RETRIEVER selects Azure AI Search ("remote")
+    or the in-process BM25 index ("local"); the local index also answers when the remote search fails.
+
+    :param query: The user query.
+    :return: Content of the matching chunks, or None if nothing matched.
+    """
+    top = config.env.kb_search_top
+    if config.env.kb_retriever == "local":
+        documents = await local_search.search(query, top)
+    else:
+        try:
+            documents = await search_remote_documents(query, top)
+        except Exception as e:
+            if not config.env.kb_local_fallback:
+                raise
+            logging.warning(f"Azure AI Search failed, using the local index: {e}")
+            documents = await local_search.search(query, top)
     return documents if documents else None
 
 
-def generate_response(query, documents):
+async def generate_response(query, documents):
     document_string = "\n".join(documents)
     prompt = f"""
     With the following context and documents provided:
@@ -141,7 +264,7 @@ def generate_response(query, documents):
     try:
         # Format prompt for the model
         with get_openai_callback() as cb:
-            output = config.llm.invoke(prompt)
+            output = await config.langchain_llm.ainvoke(prompt)
             ret = output.content.strip()
     except Exception as e:
         raise Exception(f"Error during prompt classification: {str(e)}")
@@ -149,16 +272,16 @@ def generate_response(query, documents):
     return ret
 
 
-def process_query(query: str):
+async def process_query(query: str):
     """
     Process the user query by searching for relevant documents and generating a response.
 
     :param query: The user query.
     :return: The response generated based on the query and documents.
     """
-    documents = search_documents(query)
+    documents = await search_documents(query)
     if documents:
-        response = generate_response(query, documents)
+        response = await generate_response(query, documents)
         return {"response": response}
     else:
         return {"response": "Sorry, there are no relevant documents found for the query."}
@@ -0,0 +1,136 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ASCENDING
+from motor.motor_asyncio import AsyncIOMotorCollection
+from ..config import AppConfig, get_config
+from ..helpers.cache import LRUCache
+from ..helpers.filename import get_content_hash
+from .case_index import normalize_query
+
+config: AppConfig = get_config()
+
+
+class ResponseCache:
+    """
+    Cache of chatbot answers keyed by the normalized query, the model and the prompt version,
+    plus the case id and case content version for case-scoped questions.
+    An in-process LRU tier sits in front of a Mongo tier shared by all workers; Mongo entries
+    expire after `ttl_seconds` and are evicted least recently used first beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        ttl_seconds: int,
+        max_entries: int,
+        local_entries: int,
+        local_ttl_seconds: int
+    ):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.local = LRUCache(local_entries, local_ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.indexed = False
+
+    async def ensure_indexes(self):
+        if not self.indexed:
+            await self.collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+            await self.collection.create_index([("last_accessed", ASCENDING)])
+            await self.collection.create_index([("case_id", ASCENDING)])
+            self.indexed = True
+
+    @staticmethod
+    def make_key(
+        query: str,
+        model: str,
+        prompt_version: str,
+        case_id: Optional[str] = None,
+        content_version: Optional[str] = None
+    ) -> str:
+        key = json.dumps([normalize_query(query), model, prompt_version, case_id, content_version])
+        return get_content_hash(key.encode("utf-8"))
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        :param key: Key from `make_key`.
+        :return: Cached response, or None on a miss.
+        """
+        response = self.local.get(key)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        entry = await self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"$set": {"last_accessed": datetime.utcnow()}, "$inc": {"hits": 1}},
+            {"response": 1}
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.local.set(key, entry["response"])
+        return entry["response"]
+
+    async def put(self, key: str, response: str, case_id: Optional[str] = None):
+        """
+        :param key: Key from `make_key`.
+        :param response: Generated response.
+        :param case_id: Case the response is scoped to, used for invalidation.
+        """
+        self.local.set(key, response)
+        await self.ensure_indexes()
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    "response": response,
+                    "case_id": case_id,
+                    "last_accessed": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                },
+                "$setOnInsert": {"created_at": now, "hits": 0}
+            },
+            upsert=True
+        )
+        await self.evict()
+
+    async def invalidate_case(self, case_id: str):
+        """
+        Drop the shared entries of a case whose content changed. Keys also include the case
+        content version, so stale entries left in other workers' local tiers are never hit.
+        """
+        result = await self.collection.delete_many({"case_id": case_id})
+        logging.info(f"Invalidated {result.deleted_count} cached responses for case {case_id}")
+
+    async def evict(self):
+        excess = await self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+        cursor = self.collection.find({}, {"_id": 1}).sort("last_accessed", ASCENDING).limit(excess)
+        stale = [entry["_id"] async for entry in cursor]
+        if stale:
+            await self.collection.delete_many({"_id": {"$in": stale}})
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "local": self.local.stats()
+        }
+
+
+response_cache = ResponseCache(
+    config.db["response_cache"],
+    config.env.response_cache_ttl_seconds,
+    config.env.response_cache_max_entries,
+    config.env.response_cache_local_entries,
+    config.env.response_cache_local_ttl_seconds
+)
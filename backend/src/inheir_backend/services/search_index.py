@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from azure.core.exceptions import HttpResponseError
+from ..config import AppConfig, get_config
+from ..helpers.chunking import chunk_by_tokens
+from ..helpers.concurrency import gather_bounded
+from ..helpers.filename import get_content_hash
+
+config: AppConfig = get_config()
+
+# Per-document indexing statuses worth retrying: conflicts, throttling and transient service errors
+RETRYABLE_STATUS_CODES = {409, 422, 429, 500, 502, 503}
+
+
+def get_blob_key(blob_name: str) -> str:
+    """
+    Search document key prefix of a blob; keys may only contain letters, digits, dashes, underscores and equals signs.
+    """
+    return get_content_hash(blob_name.encode("utf-8"))[:32]
+
+
+def make_chunk_documents(blob_name: str, file_path: str, filename: Optional[str], text: str) -> List[dict]:
+    """
+    Split a knowledge-base document into search documents of KB_CHUNK_TOKENS tokens.
+
+    :param blob_name: Name of the source blob.
+    :param file_path: URL to the Blob.
+    :param filename: Original filename of the document.
+    :param text: Extracted text of the document.
+    :return: One search document per chunk, keyed by blob and chunk number.
+    """
+    blob_key = get_blob_key(blob_name)
+    updated = str(datetime.now())
+    chunks = chunk_by_tokens(text, config.env.kb_chunk_tokens, config.env.kb_chunk_overlap_tokens, config.env.chunk_encoding)
+    return [
+        {
+            "id": f"{blob_key}-{idx}",
+            "updated": updated,
+            "content": chunk,
+            "metadata_file_path": file_path,
+            "metadata_filename": filename or blob_name
+        }
+        for idx, chunk in enumerate(chunks)
+    ]
+
+
+def batch_documents(documents: List[dict], max_count: int, max_bytes: int) -> Iterator[List[dict]]:
+    """
+    Group documents into the largest batches within the service's document count and payload size limits.
+    """
+    batch = []
+    batch_bytes = 0
+    for document in documents:
+        size = len(json.dumps(document).encode("utf-8"))
+        if batch and (len(batch) >= max_count or batch_bytes + size > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(document)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+async def upload_batch(documents: List[dict]) -> Dict[str, str]:
+    """
+    Merge or upload a batch of search documents, retrying the documents that failed with a transient status.
+    Batches rejected as too large are split in half.
+
+    :param documents: Search documents.
+    :return: Error message of each document that could not be indexed, keyed by document key.
+    """
+    failures: Dict[str, str] = {}
+    pending = documents
+    for attempt in range(config.env.kb_search_upload_retries + 1):
+        if attempt:
+            await asyncio.sleep(2 ** attempt)
+        try:
+            results = await config.search.merge_or_upload_documents(documents=pending)
+        except HttpResponseError as e:
+            if e.status_code == 413 and len(pending) > 1:
+                middle = len(pending) // 2
+                failures.update(await upload_batch(pending[:middle]))
+                failures.update(await upload_batch(pending[middle:]))
+                return failures
+            if e.status_code in RETRYABLE_STATUS_CODES and attempt < config.env.kb_search_upload_retries:
+                logging.warning(f"Search batch upload failed with {e.status_code}, retrying: {e}")
+                continue
+            failures.update({document["id"]: str(e) for document in pending})
+            return failures
+
+        by_key = {document["id"]: document for document in pending}
+        retry = []
+        for result in results:
+            if result.succeeded:
+                continue
+            if result.status_code in RETRYABLE_STATUS_CODES and attempt < config.env.kb_search_upload_retries:
+                retry.append(by_key[result.key])
+            else:
+                failures[result.key] = result.error_message or f"Status {result.status_code}"
+        if not retry:
+            return failures
+        logging.warning(f"Retrying {len(retry)} of {len(pending)} search documents")
+        pending = retry
+    return failures
+
+
+async def upload_search_documents(documents: List[dict]) -> Dict[str, str]:
+    """
+    Index search documents in maximal batches, with KB_SEARCH_UPLOAD_CONCURRENCY batches in flight.
+
+    :param documents: Search documents.
+    :return: Error message of each document that could not be indexed, keyed by document key.
+    """
+    batches = list(batch_documents(documents, config.env.kb_search_batch_size, config.env.kb_search_batch_bytes))
+    results = await gather_bounded(batches, upload_batch, config.env.kb_search_upload_concurrency)
+    failures: Dict[str, str] = {}
+    for batch, (result, error) in zip(batches, results):
+        if error is not None:
+            logging.error(f"Search batch upload failed: {error}")
+            failures.update({document["id"]: str(error) for document in batch})
+        else:
+            failures.update(result)
+    return failures
+
+
+async def delete_search_documents(keys: List[str]):
+    if keys:
+        await config.search.delete_documents(documents=[{"id": key} for key in keys])
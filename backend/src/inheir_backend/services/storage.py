@@ -1,72 +1,144 @@
+import base64
+import hashlib
+import os
+from datetime import datetime
+from pymongo import ASCENDING
 from ..config import AppConfig, get_config
 from fastapi import UploadFile
-from ..helpers.filename import get_filename_hash
-from azure.storage.blob import BlobClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock
+from azure.storage.blob.aio import BlobClient, ContainerClient
 
 config: AppConfig = get_config()
 
 
+async def ensure_upload_indexes():
+    """
+    Create indexes for the upload reference records.
+    """
+    references = config.db["upload_references"]
+    await references.create_index([("blob_name", ASCENDING)])
+    await references.create_index([("user_id", ASCENDING), ("case_id", ASCENDING)])
+
+
+class UploadTooLargeError(Exception):
+    """
+    Raised when an uploaded file exceeds the configured maximum size.
+    """
+
+
+async def hash_upload(file: UploadFile):
+    """
+    Hash an uploaded file chunk by chunk, enforcing the maximum upload size.
+
+    :param file: File uploaded from the FastAPI endpoint.
+    :return: Tuple of the hex digest and the size in bytes.
+    """
+    hash_func = hashlib.sha256()
+    size = 0
+    await file.seek(0)
+    while chunk := await file.read(config.env.upload_block_bytes):
+        size += len(chunk)
+        if size > config.env.upload_max_bytes:
+            raise UploadTooLargeError(
+                f"{file.filename} exceeds the maximum upload size of {config.env.upload_max_bytes} bytes")
+        hash_func.update(chunk)
+    await file.seek(0)
+    return (hash_func.hexdigest(), size)
+
+
+def get_blob_name(digest: str, filename: str | None) -> str:
+    return f"{digest}{os.path.splitext(filename or '')[1]}"
+
+
+async def stream_upload(container: ContainerClient, file: UploadFile, metadata: dict, digest: str | None = None):
+    """
+    Upload a file to a content-addressed blob as staged blocks, holding at most one block in memory.
+    The upload is skipped when a blob with the same content already exists.
+
+    :param container: Container to upload to.
+    :param file: File uploaded from the FastAPI endpoint.
+    :param metadata: Extra blob metadata.
+    :param digest: Hex digest of the file, if already hashed.
+    :return: Tuple of the blob name, the hex digest and whether the blob was written.
+    """
+    if digest is None:
+        digest, _ = await hash_upload(file)
+    blob_name = get_blob_name(digest, file.filename)
+    blob_client: BlobClient = container.get_blob_client(blob_name)
+
+    try:
+        properties = await blob_client.get_blob_properties()
+        # Rewriting the metadata changes the ETag, so a cleanup that checked references before this
+        # upload's reference existed cannot delete the blob (it deletes only if the ETag is unchanged)
+        await blob_client.set_blob_metadata(properties.metadata)
+        return (blob_name, digest, False)
+    except ResourceNotFoundError:
+        pass
+
+    block_list = []
+    while chunk := await file.read(config.env.upload_block_bytes):
+        block_id = base64.b64encode(f"{len(block_list):08d}".encode()).decode()
+        await blob_client.stage_block(block_id, chunk)
+        block_list.append(BlobBlock(block_id=block_id))
+
+    # Blobs are content-addressed, so a concurrent commit of the same digest writes identical bytes
+    await blob_client.commit_block_list(block_list, metadata={**metadata, "id": digest, "sha256": digest})
+    return (blob_name, digest, True)
+
+
 async def upload_user_file(file: UploadFile, user_id: str, case_id: str | None, chat_id: str | None, case: bool = True):
     """
-    Accept File uploaded from FastAPI endpoint
+    Accept File uploaded from FastAPI endpoint.
+    Files are stored by content digest and shared between users, cases and chats through reference records.
     """
-    file_content = await file.read()
     file_name = file.filename
+    digest, _ = await hash_upload(file)
+    blob_name = get_blob_name(digest, file_name)
 
-    # Create a Blob client and upload the file
-    hashed_filename, digest = get_filename_hash(file_name)
-    
-    blob_client: BlobClient = config.uploads.get_blob_client(
-        hashed_filename)
-
-    blob_client.upload_blob(
-        file_content,
-        overwrite=True,
-        metadata={
-            "user_id": user_id,
-            "filename": file_name,
-            "id": digest,
-            "case_id": case_id,
-            "chat_id": chat_id
-        })
+    # Reference the blob before checking for or writing it, so cleanup never sees an upload in progress as unreferenced
+    references = config.db["upload_references"]
+    reference = await references.insert_one({
+        "blob_name": blob_name,
+        "sha256": digest,
+        "filename": file_name,
+        "user_id": user_id,
+        "case_id": case_id,
+        "chat_id": chat_id,
+        "case": case,
+        "created_at": datetime.utcnow()
+    })
+
+    # Stream the file to a Blob named by its content digest
+    try:
+        _, _, uploaded = await stream_upload(config.uploads, file, metadata={}, digest=digest)
+    except Exception:
+        await references.delete_one({"_id": reference.inserted_id})
+        raise
 
     # results = ingest_document(
-    #    f"{config.env.knowledge_base_endpoint}{hashed_filename}")
-    return {"status": "success", "url": f"{config.env.uploads_endpoint}{hashed_filename}"}
+    #    f"{config.env.knowledge_base_endpoint}{blob_name}")
+    return {"status": "success", "url": f"{config.env.uploads_endpoint}{blob_name}", "deduplicated": not uploaded}
 
 
 async def upload_knowledge_base_file(file: UploadFile):
     """
     Upload file to knowledge base from FastAPI endpoint
     """
-    file_content = await file.read()
-    file_name = file.filename
+    # Stream the file to a Blob named by its content digest
+    blob_name, digest, uploaded = await stream_upload(
+        config.knowledge_base, file, metadata={"filename": file.filename})
 
-    # Create a Blob client and upload the file
-    hashed_filename, digest = get_filename_hash(file_name)
-    
-    blob_client: BlobClient = config.knowledge_base.get_blob_client(
-        hashed_filename)
+    return {"status": "success", "url": f"{config.env.knowledge_base_endpoint}{blob_name}", "deduplicated": not uploaded}
 
-    blob_client.upload_blob(file_content, overwrite=True, metadata={
-                            "filename": file_name, "id": digest})
 
-    return {"status": "success", "url": f"{config.env.knowledge_base_endpoint}{hashed_filename}"}
-
-
-def update_user_metadata(hashed_file_name: str,  case_id: str | None, chat_id: str | None):
+async def update_user_metadata(blob_name: str, user_id: str, case_id: str | None, chat_id: str | None):
     """
-    Update user file's metadata
+    Update the case and chat a user's uploaded file belongs to
     """
-    
-    blob_client: BlobClient = config.uploads.get_blob_client(
-        hashed_file_name)
-
-    properties = blob_client.get_blob_properties()
-    prev_metadata = properties.metadata or {}
-    update_metadata = {"case_id": case_id, "chat_id": chat_id}
-    updated_metadata = {**prev_metadata, **update_metadata}
-    
-    blob_client.set_blob_metadata(updated_metadata)
-
-    return {"status": "success", "url": f"{config.env.uploads_endpoint}{hashed_filename}"}
+    await config.db["upload_references"].update_many(
+        {"blob_name": blob_name, "user_id": user_id},
+        {"$set": {"case_id": case_id, "chat_id": chat_id}}
+    )
+
+    return {"status": "success", "url": f"{config.env.uploads_endpoint}{blob_name}"}
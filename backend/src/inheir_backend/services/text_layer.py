@@ -0,0 +1,81 @@
+import logging
+from io import BytesIO
+from typing import List, Optional
+from pypdf import PdfReader
+
+
+class ExtractionMetrics:
+    """
+    Counts how many pages were extracted from the embedded text layer and how many were sent to OCR.
+    """
+
+    def __init__(self):
+        self.local_pages = 0
+        self.remote_pages = 0
+
+    def record(self, local_pages: int, remote_pages: int):
+        self.local_pages += local_pages
+        self.remote_pages += remote_pages
+
+    def stats(self) -> dict:
+        total = self.local_pages + self.remote_pages
+        return {
+            "local_pages": self.local_pages,
+            "remote_pages": self.remote_pages,
+            "local_ratio": self.local_pages / total if total else 0.0
+        }
+
+
+extraction_metrics = ExtractionMetrics()
+
+
+def extract_text_layer(content: bytes, min_chars: int) -> List[Optional[str]]:
+    """
+    Extract the embedded text layer of a PDF page by page.
+
+    :param content: PDF file content.
+    :param min_chars: Minimum number of non-whitespace characters for a page to count as born-digital.
+    :return: Text of each page, or None for pages that look scanned and need OCR.
+    """
+    try:
+        reader = PdfReader(BytesIO(content))
+    except Exception as e:
+        logging.warning(f"Could not read PDF text layer: {e}")
+        return []
+
+    pages = []
+    for page in reader.pages:
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            logging.warning(f"Could not extract PDF page text: {e}")
+            text = ""
+        pages.append(text if len("".join(text.split())) >= min_chars else None)
+    return pages
+
+
+def count_pdf_pages(content: bytes) -> int:
+    """
+    Count the pages of a PDF without extracting text.
+
+    :param content: PDF file content.
+    :return: Number of pages, or 0 if the PDF cannot be read.
+    """
+    try:
+        return len(PdfReader(BytesIO(content)).pages)
+    except Exception as e:
+        logging.warning(f"Could not read PDF page count: {e}")
+        return 0
+
+
+def format_page_ranges(page_numbers: List[int]) -> str:
+    """
+    Format 1-based page numbers as a Document Intelligence page range string, e.g. "1-3,5".
+    """
+    ranges = []
+    for page_number in sorted(page_numbers):
+        if ranges and ranges[-1][1] == page_number - 1:
+            ranges[-1][1] = page_number
+        else:
+            ranges.append([page_number, page_number])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
@@ -0,0 +1,45 @@
+"""
+Micro-benchmark of the in-process BM25 retriever. Runs offline on a synthetic corpus.
+
+Run from backend/src:
+    python -m scripts.benchmark_bm25 --documents 50000 --queries 1000
+"""
+import argparse
+import random
+import time
+from inheir_backend.helpers.bm25 import BM25Index
+from scripts.benchmark_chunking import WORDS, generate_text
+
+
+def run(documents: int, document_bytes: int, queries: int, top: int):
+    rng = random.Random(0)
+    corpus = [(f"doc-{idx}", generate_text(document_bytes, seed=idx)) for idx in range(documents)]
+
+    index = BM25Index()
+    started = time.perf_counter()
+    index.add_many(corpus)
+    add_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index.build()
+    build_seconds = time.perf_counter() - started
+
+    query_texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))) for _ in range(queries)]
+    started = time.perf_counter()
+    for query in query_texts:
+        index.search(query, top)
+    query_seconds = time.perf_counter() - started
+
+    print(f"Corpus: {documents} documents, {len(index.vocabulary)} terms, {len(index.posting_docs)} postings")
+    print(f"Add: {documents / add_seconds:.0f} documents/s, build: {build_seconds * 1000:.1f} ms")
+    print(f"Query: {query_seconds / queries * 1000:.2f} ms per query ({queries / query_seconds:.0f} queries/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--document-bytes", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+    run(args.documents, args.document_bytes, args.queries, args.top)
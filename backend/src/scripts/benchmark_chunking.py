@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of the token-aware chunker against fixed-size character slicing.
+
+Run from backend/src:
+    python -m scripts.benchmark_chunking --megabytes 4 --max-tokens 3000 --overlap-tokens 150
+"""
+import argparse
+import random
+import time
+from inheir_backend.helpers.chunking import DEFAULT_ENCODING, chunk_by_tokens, count_tokens
+
+WORDS = [
+    "the", "deceased", "property", "estate", "heir", "claimant", "court", "parcel", "deed", "transfer",
+    "registered", "owner", "witness", "agreement", "boundary", "survey", "tenant", "inheritance", "plaintiff",
+    "respondent", "hereby", "pursuant", "section", "schedule", "land", "title", "mortgage", "will", "probate"
+]
+
+
+def generate_text(size_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    size = 0
+    while size < size_bytes:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + rng.choice([".", ".", ";", "?"])
+            for _ in range(rng.randint(2, 8))
+        ]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def slice_chars(text: str, max_chunk_size: int = 1000):
+    return [text[i:i+max_chunk_size] for i in range(0, len(text), max_chunk_size)]
+
+
+def run(megabytes: float, max_tokens: int, overlap_tokens: int, encoding_name: str, repeat: int):
+    text = generate_text(int(megabytes * 1024 * 1024))
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+    count_tokens("warm up", encoding_name)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        sliced = slice_chars(text)
+    slice_seconds = (time.perf_counter() - started) / repeat
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        chunks = chunk_by_tokens(text, max_tokens, overlap_tokens, encoding_name)
+    chunk_seconds = (time.perf_counter() - started) / repeat
+
+    largest = max(count_tokens(chunk, encoding_name) for chunk in chunks)
+    print(f"Input: {size_mb:.2f} MB, {count_tokens(text, encoding_name)} tokens ({encoding_name})")
+    print(f"Character slicing: {len(sliced)} chunks in {slice_seconds * 1000:.1f} ms")
+    print(
+        f"Token chunking:    {len(chunks)} chunks in {chunk_seconds * 1000:.1f} ms "
+        f"({size_mb / chunk_seconds:.1f} MB/s), largest chunk {largest} tokens"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=4)
+    parser.add_argument("--max-tokens", type=int, default=3000)
+    parser.add_argument("--overlap-tokens", type=int, default=150)
+    parser.add_argument("--encoding", default=DEFAULT_ENCODING)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.megabytes, args.max_tokens, args.overlap_tokens, args.encoding, args.repeat)
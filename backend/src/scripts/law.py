@@ -1,2 +1,26 @@
-async def index_law_data():
-    pass
\ No newline at end of file
+import argparse
+import asyncio
+import json
+import logging
+from inheir_backend.config import get_config
+from inheir_backend.services.ingestion import ingest_knowledge_base
+
+
+async def index_law_data(resume: bool = True, force: bool = False):
+    """
+    Index the law documents of the knowledge base container into Azure AI Search.
+    """
+    try:
+        report = await ingest_knowledge_base(resume=resume, force=force)
+        print(json.dumps(report, indent=2))
+    finally:
+        await get_config().close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Index the knowledge base into Azure AI Search.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    parser.add_argument("--force", action="store_true", help="Re-index documents even when unchanged")
+    args = parser.parse_args()
+    asyncio.run(index_law_data(resume=not args.restart, force=args.force))
@@ -0,0 +1,52 @@
+import os
+import pytest
+
+# Placeholder settings so service modules can be imported without a .env; tests never reach these services
+TEST_ENVIRONMENT = {
+    "ENVIRONMENT": "test",
+    "COOKIE_DOMAIN": "localhost",
+    "API_DOMAIN": "localhost",
+    "FRONTEND_URL": "http://localhost:3000",
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "MONGODB_DB_NAME": "inheir_test",
+    "JWT_SECRET": "test",
+    "KNOWLEDGE_BASE_ENDPOINT": "https://test.blob.core.windows.net/kb/",
+    "UPLOADS_ENDPOINT": "https://test.blob.core.windows.net/uploads/",
+    "AZURE_STORAGE_ACCOUNT_CONNECTION_STRING": "DefaultEndpointsProtocol=https;AccountName=test;AccountKey=dGVzdA==;EndpointSuffix=core.windows.net",
+    "KB_CONTAINER_NAME": "kb",
+    "UPLOADS_CONTAINER_NAME": "uploads",
+    "AI_SEARCH_ENDPOINT": "https://test.search.windows.net",
+    "AI_SEARCH_API_KEY": "test",
+    "AI_SEARCH_INDEX_NAME": "test",
+    "DOCUMENT_INTELLIGENCE_ENDPOINT": "https://test.cognitiveservices.azure.com/",
+    "DOCUMENT_INTELLIGENCE_KEY": "test",
+    "AZURE_SUBSCRIPTION_ID": "test",
+    "AZURE_CLIENT_ID": "test",
+    "AZURE_TENANT_ID": "test",
+    "AZURE_CLIENT_SECRET": "test",
+    "AZURE_AI_PROJECT_NAME": "test",
+    "AZURE_RG_NAME": "test",
+    "AZURE_AI_ENDPOINT": "https://test.services.ai.azure.com",
+    "AZURE_LANGUAGE_API_KEY": "test",
+    "AZURE_LANGUAGE_ENDPOINT": "https://test.cognitiveservices.azure.com/",
+    "AZURE_OPENAI_API_KEY": "test",
+    "AZURE_OPENAI_ENDPOINT": "https://test.openai.azure.com/",
+    "AZURE_OPENAI_DEPLOYMENT": "test",
+    "AZURE_OPENAI_API_VERSION": "2024-08-01-preview",
+    "AZURE_OPENAI_MODEL_NAME": "test",
+    "ANONYMOUS_USER_ID": "000000000000000000000000",
+    "OPENCAGE_API_KEY": "test"
+}
+
+environment = pytest.MonkeyPatch()
+
+
+def pytest_configure(config):
+    # Service modules read their settings at import time, so the environment is set before test modules are collected
+    for name, value in TEST_ENVIRONMENT.items():
+        if name not in os.environ:
+            environment.setenv(name, value)
+
+
+def pytest_unconfigure(config):
+    environment.undo()
@@ -0,0 +1,91 @@
+import unittest
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from inheir_backend.helpers.bm25 import BM25Index, tokenize
+
+DOCUMENTS = [
+    ("will", "A will names the heirs of the estate and the executor."),
+    ("probate", "Probate is the court process that validates a will."),
+    ("tax", "Inheritance tax is due on estates above the threshold."),
+    ("lease", "A lease grants the tenant the use of a property.")
+]
+
+
+class BM25IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add_many(DOCUMENTS)
+
+    def keys(self, query: str, k: int = 10) -> list:
+        return [key for key, _, _ in self.index.search(query, k)]
+
+    def test_tokenize_is_case_insensitive(self):
+        self.assertEqual(tokenize("Probate, WILL!"), ["probate", "will"])
+
+    def test_search_ranks_matching_documents(self):
+        results = self.index.search("will executor", 10)
+
+        self.assertEqual([key for key, _, _ in results], ["will", "probate"])
+        self.assertEqual(results[0][1], DOCUMENTS[0][1])
+        self.assertGreater(results[0][2], results[1][2])
+
+    def test_search_returns_at_most_k_results(self):
+        self.assertEqual(self.keys("will executor", k=1), ["will"])
+
+    def test_search_without_matches(self):
+        self.assertEqual(self.keys("mortgage"), [])
+        self.assertEqual(BM25Index().search("will", 10), [])
+
+    def test_add_replaces_a_document_with_the_same_key(self):
+        self.index.search("will", 10)
+        self.index.add("lease", "A lease can be inherited by the heirs.")
+
+        self.assertEqual(len(self.index), 4)
+        self.assertNotIn("lease", self.keys("tenant"))
+        self.assertIn("lease", self.keys("inherited"))
+
+    def test_adding_unchanged_content_keeps_the_index_built(self):
+        self.index.search("will", 10)
+        self.index.add(*DOCUMENTS[0])
+
+        self.assertFalse(self.index.dirty)
+
+    def test_removed_document_is_not_returned(self):
+        self.index.remove("probate")
+        self.index.remove("missing")
+
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.keys("will"), ["will"])
+        self.assertEqual(self.keys("court"), [])
+
+    def test_removing_most_documents_compacts_the_index(self):
+        for key in ["will", "probate", "tax"]:
+            self.index.remove(key)
+
+        self.assertEqual(self.index.keys, ["lease"])
+        self.assertEqual(self.index.removed, 0)
+        self.assertEqual(self.keys("tenant"), ["lease"])
+        self.assertEqual(self.keys("will"), [])
+
+    def test_compact_keeps_scores(self):
+        self.index.remove("tax")
+        before = self.index.search("will estate", 10)
+        self.index.compact()
+
+        after = self.index.search("will estate", 10)
+        self.assertEqual([key for key, _, _ in after], [key for key, _, _ in before])
+        for (_, _, score_before), (_, _, score_after) in zip(before, after):
+            self.assertAlmostEqual(score_before, score_after, places=5)
+
+    def test_documents_added_after_search_are_found(self):
+        self.index.search("will", 10)
+        self.index.add("trust", "A trust holds property for the beneficiaries.")
+
+        self.assertEqual(self.keys("beneficiaries"), ["trust"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from inheir_backend.helpers import chunking
+from inheir_backend.helpers.chunking import CHARS_PER_TOKEN, chunk_by_tokens, chunk_by_tokens_capped, count_tokens
+
+SENTENCES = [f"Clause {idx} of the agreement transfers the estate to the heir." for idx in range(60)]
+TEXT = " ".join(SENTENCES)
+
+
+class ChunkByTokensTest(unittest.TestCase):
+    def test_chunks_fit_the_token_budget(self):
+        chunks = chunk_by_tokens(TEXT, max_tokens=60, overlap_tokens=20)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk), 60)
+
+    def test_chunks_are_cut_at_sentence_ends(self):
+        chunks = chunk_by_tokens(TEXT, max_tokens=60, overlap_tokens=20)
+
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith("Clause "), chunk)
+            self.assertTrue(chunk.endswith("to the heir."), chunk)
+
+    def test_consecutive_chunks_overlap(self):
+        chunks = chunk_by_tokens(TEXT, max_tokens=60, overlap_tokens=20)
+
+        for previous, chunk in zip(chunks, chunks[1:]):
+            last_sentence = "Clause " + previous.rsplit("Clause ", 1)[1]
+            self.assertTrue(chunk.startswith(last_sentence), (previous, chunk))
+
+    def test_chunks_without_overlap_cover_the_text_once(self):
+        chunks = chunk_by_tokens(TEXT, max_tokens=60, overlap_tokens=0)
+
+        self.assertEqual(" ".join(chunks), TEXT)
+
+    def test_line_breaks_are_boundaries(self):
+        text = "\n".join(f"Item {idx} without a full stop" for idx in range(40))
+        chunks = chunk_by_tokens(text, max_tokens=30)
+
+        for chunk in chunks:
+            for line in chunk.split("\n"):
+                self.assertRegex(line, r"^Item \d+ without a full stop$")
+
+    def test_sentence_longer_than_the_budget_is_split(self):
+        text = " ".join(f"word{idx}" for idx in range(500))
+        chunks = chunk_by_tokens(text, max_tokens=50)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk), 50)
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(chunk_by_tokens("  One short sentence.  ", max_tokens=60), ["One short sentence."])
+
+    def test_blank_text_has_no_chunks(self):
+        self.assertEqual(chunk_by_tokens("", max_tokens=60), [])
+        self.assertEqual(chunk_by_tokens(" \n\n ", max_tokens=60), [])
+
+
+class CharacterEncoding:
+    """
+    Tokenizer stand-in with one token per character, i.e. text far denser than the character estimate assumes.
+    """
+
+    def encode_ordinary(self, text: str) -> list:
+        return list(text)
+
+    def encode_ordinary_batch(self, texts: list) -> list:
+        return [list(text) for text in texts]
+
+    def decode(self, tokens: list) -> str:
+        return "".join(tokens)
+
+
+class ChunkByTokensCappedTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(chunking, "get_encoding", return_value=CharacterEncoding())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_chunk_count_is_capped_on_dense_text(self):
+        estimated_budget = len(TEXT) // CHARS_PER_TOKEN // 8
+        self.assertGreater(len(chunk_by_tokens(TEXT, estimated_budget, 50)), 8)
+
+        chunks, budget = chunk_by_tokens_capped(TEXT, max_tokens=100, max_chunks=8, overlap_tokens=50)
+
+        self.assertLessEqual(len(chunks), 8)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk), budget)
+
+    def test_cap_holds_for_a_single_chunk(self):
+        chunks, budget = chunk_by_tokens_capped(TEXT, max_tokens=100, max_chunks=1, overlap_tokens=50)
+
+        self.assertEqual(chunks, [TEXT])
+        self.assertGreaterEqual(budget, len(TEXT))
+
+    def test_budget_is_kept_when_the_text_fits(self):
+        chunks, budget = chunk_by_tokens_capped(TEXT, max_tokens=1000, max_chunks=8)
+
+        self.assertEqual(budget, 1000)
+        self.assertEqual(chunks, chunk_by_tokens(TEXT, 1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+# Service modules need the project dependencies, installed with `poetry install`
+pytest.importorskip("inheir_backend.config")
+pytest.importorskip("geopandas")
+
+import geopandas as gpd
+from shapely.geometry import Point, box
+
+from inheir_backend.models.gis import METRIC_FIELDS, Coordinates
+from inheir_backend.services import gis
+from inheir_backend.services.gis_layers import GISLayers
+
+COORDINATES = Coordinates(latitude=51.5034, longitude=-0.1276)
+
+
+class AnalyzeAddressTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cached = None
+        self.nearby = None
+        self.covered = False
+        self.geocoded = COORDINATES
+        self.stored = []
+        self.analyze_metrics = mock.AsyncMock(return_value={field: 0.5 for field in METRIC_FIELDS})
+        layers = mock.Mock(loaded=False)
+        layers.score = lambda coordinates: [
+            {field: 0.9 for field in METRIC_FIELDS} if self.covered else None for _ in coordinates
+        ]
+        self.layers = layers
+        patches = [
+            mock.patch.object(gis, "analyze_metrics", self.analyze_metrics),
+            mock.patch.object(gis, "get_cached_analysis", self.get_cached_analysis),
+            mock.patch.object(gis, "store_analysis", self.store_analysis),
+            mock.patch.object(gis, "find_nearby_analysis", self.find_nearby_analysis),
+            mock.patch.object(gis.geocoder, "geocode", self.geocode),
+            mock.patch.object(gis, "gis_layers", layers),
+            mock.patch.object(gis.config.env, "gis_reuse_radius_meters", 100)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def get_cached_analysis(self, key):
+        return self.cached
+
+    async def store_analysis(self, key, address, result):
+        self.stored.append(result)
+
+    async def find_nearby_analysis(self, coordinates):
+        return self.nearby
+
+    async def geocode(self, address):
+        geocoded = self.geocoded.pop(0) if isinstance(self.geocoded, list) else self.geocoded
+        if isinstance(geocoded, Exception):
+            raise geocoded
+        return geocoded
+
+    async def test_nearby_analysis_is_reused_without_calling_the_llm(self):
+        self.nearby = ({field: 0.2 for field in METRIC_FIELDS}, 42.0, 600.0)
+
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.analyze_metrics.assert_not_called()
+        self.assertEqual(self.stored, [])
+        self.assertTrue(result["cached"])
+        self.assertEqual(result["reused_distance_m"], 42.0)
+        self.assertEqual(result["coordinates"], COORDINATES.model_dump())
+
+    async def test_llm_is_called_when_no_nearby_analysis_exists(self):
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.analyze_metrics.assert_awaited_once()
+        self.assertEqual(self.stored, [result])
+        self.assertFalse(result["partial"])
+
+    async def test_failed_geocoding_falls_back_to_the_llm(self):
+        self.geocoded = RuntimeError("geocoder unavailable")
+
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.analyze_metrics.assert_awaited_once()
+        self.assertIsNone(result["coordinates"])
+        self.assertTrue(result["partial"])
+        self.assertEqual(self.stored, [])
+
+    async def test_covered_location_is_scored_without_calling_the_llm(self):
+        self.layers.loaded = True
+        self.covered = True
+        self.nearby = ({field: 0.2 for field in METRIC_FIELDS}, 42.0, 600.0)
+
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.analyze_metrics.assert_not_called()
+        self.assertEqual(result["source"], "layers")
+        self.assertEqual(result["flood_risk"], 0.9)
+        self.assertEqual(self.stored, [])
+
+    async def test_uncovered_location_falls_back_to_the_llm(self):
+        self.layers.loaded = True
+
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.analyze_metrics.assert_awaited_once()
+        self.assertNotEqual(result.get("source"), "layers")
+        self.assertEqual(self.stored, [result])
+
+    async def test_stored_llm_analysis_of_a_covered_location_gives_way_to_the_layers(self):
+        self.layers.loaded = True
+        self.covered = True
+        self.cached = {**{field: 0.5 for field in METRIC_FIELDS}, "coordinates": COORDINATES.model_dump(), "partial": False}
+
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.analyze_metrics.assert_not_called()
+        self.assertEqual(result["source"], "layers")
+
+    async def test_llm_result_for_a_covered_location_is_not_served_or_stored(self):
+        # The first geocoding fails, and the one run with the LLM analysis finds a covered location
+        self.layers.loaded = True
+        self.covered = True
+        self.geocoded = [RuntimeError("geocoder unavailable"), COORDINATES]
+
+        result = await gis.analyze_address("10 Downing St, London")
+
+        self.assertEqual(result["source"], "layers")
+        self.assertEqual(self.stored, [])
+
+
+class GISLayersTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.flood = gpd.GeoDataFrame({"risk": [0.7]}, geometry=[box(-0.2, 51.45, -0.05, 51.55)], crs=4326)
+        self.stops = gpd.GeoDataFrame(geometry=[Point(-0.1276, 51.504)], crs=4326)
+
+    def load(self, crs) -> tuple:
+        flood_path = self.directory / f"flood_{crs}.gpkg"
+        transit_path = self.directory / f"transit_{crs}.gpkg"
+        self.flood.to_crs(crs).to_file(flood_path)
+        self.stops.to_crs(crs).to_file(transit_path)
+        layers = GISLayers(str(flood_path), None, str(transit_path), None, None, 1000, 20, 800)
+        with mock.patch.object(gpd.GeoDataFrame, "to_crs", autospec=True, side_effect=gpd.GeoDataFrame.to_crs) as to_crs:
+            layers.load()
+        return layers, to_crs.call_count
+
+    def score(self, layers: GISLayers) -> list:
+        return layers.score([COORDINATES, Coordinates(latitude=48.8566, longitude=2.3522)])
+
+    def test_layers_in_the_serving_zone_are_not_reprojected(self):
+        utm = self.flood.estimate_utm_crs()
+        projected, projections = self.load(utm)
+
+        self.assertEqual(projected.crs, utm)
+        self.assertEqual(projections, 0)
+
+    def test_layers_score_the_same_in_any_stored_crs(self):
+        geographic, projections = self.load(4326)
+        projected, _ = self.load(self.flood.estimate_utm_crs())
+        mercator, _ = self.load(3857)
+
+        self.assertEqual(projections, 2)
+        scores = self.score(geographic)
+        self.assertEqual(scores[0]["flood_risk"], 0.7)
+        self.assertIsNone(scores[1])
+        for layers in [projected, mercator]:
+            other = self.score(layers)
+            self.assertIsNone(other[1])
+            for metric, value in scores[0].items():
+                self.assertAlmostEqual(other[0][metric], value, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+import pytest
+
+# Service modules need the project dependencies, installed with `poetry install`
+pytest.importorskip("inheir_backend.config")
+
+from inheir_backend.services.jobs import InMemoryJobQueue, JobWorkerPool, PermanentJobError
+
+
+class InMemoryJobQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.queue = InMemoryJobQueue(lease_seconds=60)
+
+    def expire(self, job_id: str):
+        self.queue.jobs[job_id]["lease_until"] = datetime.utcnow() - timedelta(seconds=1)
+
+    async def test_claim_oldest_queued_job(self):
+        first = await self.queue.enqueue("case", {"n": 1})
+        second = await self.queue.enqueue("case", {"n": 2})
+
+        job = await self.queue.claim(max_attempts=3)
+        self.assertEqual(job["job_id"], first)
+        self.assertEqual(job["status"], "running")
+        self.assertEqual(job["attempts"], 1)
+        self.assertIsNotNone(job["lease_token"])
+
+        self.assertEqual((await self.queue.claim(max_attempts=3))["job_id"], second)
+        self.assertIsNone(await self.queue.claim(max_attempts=3))
+
+    async def test_running_job_is_not_claimed_while_leased(self):
+        await self.queue.enqueue("case", {})
+        await self.queue.claim(max_attempts=3)
+        self.assertIsNone(await self.queue.claim(max_attempts=3))
+
+    async def test_expired_lease_is_reclaimed_with_new_token(self):
+        job_id = await self.queue.enqueue("case", {})
+        job = await self.queue.claim(max_attempts=3)
+        self.expire(job_id)
+
+        reclaimed = await self.queue.claim(max_attempts=3)
+        self.assertEqual(reclaimed["job_id"], job_id)
+        self.assertEqual(reclaimed["attempts"], 2)
+        self.assertNotEqual(reclaimed["lease_token"], job["lease_token"])
+        # The first worker lost the lease
+        self.assertFalse(await self.queue.renew(job_id, job["lease_token"]))
+        self.assertTrue(await self.queue.renew(job_id, reclaimed["lease_token"]))
+
+    async def test_expired_lease_on_last_attempt_fails_the_job(self):
+        job_id = await self.queue.enqueue("case", {})
+        for _ in range(2):
+            await self.queue.claim(max_attempts=2)
+            self.expire(job_id)
+
+        self.assertIsNone(await self.queue.claim(max_attempts=2))
+        failed = await self.queue.fail_abandoned(max_attempts=2)
+        self.assertEqual([job["job_id"] for job in failed], [job_id])
+        job = await self.queue.get(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["stage"], "failed")
+        self.assertEqual(await self.queue.fail_abandoned(max_attempts=2), [])
+
+    async def test_fail_with_retry_requeues(self):
+        job_id = await self.queue.enqueue("case", {})
+        await self.queue.claim(max_attempts=3)
+        await self.queue.fail(job_id, "transient", retry=True)
+
+        job = await self.queue.get(job_id)
+        self.assertEqual(job["status"], "queued")
+        self.assertEqual(job["error"], "transient")
+
+
+class JobWorkerPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.queue = InMemoryJobQueue(lease_seconds=60)
+        self.failures = []
+
+    async def on_failure(self, job: dict, error: str):
+        self.failures.append((job["job_id"], error))
+
+    def make_pool(self, handler, max_attempts: int = 3) -> JobWorkerPool:
+        return JobWorkerPool(self.queue, handler, 1, max_attempts=max_attempts, on_failure=self.on_failure)
+
+    async def run_until_idle(self, pool: JobWorkerPool):
+        while True:
+            await pool.fail_abandoned()
+            job = await self.queue.claim(pool.max_attempts)
+            if job is None:
+                return
+            await pool.run_job(job)
+
+    async def test_completed_job_records_stages(self):
+        stages = []
+
+        async def handler(job, set_stage):
+            await set_stage("extracting")
+            stages.append(self.queue.jobs[job["job_id"]]["stage"])
+
+        job_id = await self.queue.enqueue("case", {})
+        await self.run_until_idle(self.make_pool(handler))
+
+        self.assertEqual(stages, ["extracting"])
+        self.assertEqual((await self.queue.get(job_id))["status"], "completed")
+
+    async def test_transient_error_is_retried_until_success(self):
+        calls = []
+
+        async def handler(job, set_stage):
+            calls.append(job["attempts"])
+            if len(calls) < 3:
+                raise RuntimeError("transient")
+
+        job_id = await self.queue.enqueue("case", {})
+        await self.run_until_idle(self.make_pool(handler))
+
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual((await self.queue.get(job_id))["status"], "completed")
+        self.assertEqual(self.failures, [])
+
+    async def test_retries_stop_at_max_attempts(self):
+        calls = []
+
+        async def handler(job, set_stage):
+            calls.append(job["attempts"])
+            raise RuntimeError("still failing")
+
+        job_id = await self.queue.enqueue("case", {})
+        await self.run_until_idle(self.make_pool(handler, max_attempts=2))
+
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual((await self.queue.get(job_id))["status"], "failed")
+        self.assertEqual(self.failures, [(job_id, "still failing")])
+
+    async def test_permanent_error_is_not_retried(self):
+        calls = []
+
+        async def handler(job, set_stage):
+            calls.append(job["attempts"])
+            raise PermanentJobError("invalid document")
+
+        job_id = await self.queue.enqueue("case", {})
+        await self.run_until_idle(self.make_pool(handler))
+
+        self.assertEqual(calls, [1])
+        self.assertEqual((await self.queue.get(job_id))["stage"], "failed")
+        self.assertEqual(self.failures, [(job_id, "invalid document")])
+
+    async def test_abandoned_job_on_last_attempt_is_failed(self):
+        job_id = await self.queue.enqueue("case", {})
+        # A worker claimed the job on its last attempt and died
+        await self.queue.claim(max_attempts=1)
+        self.queue.jobs[job_id]["lease_until"] = datetime.utcnow() - timedelta(seconds=1)
+
+        async def handler(job, set_stage):
+            self.fail("Abandoned job must not run again")
+
+        await self.run_until_idle(self.make_pool(handler, max_attempts=1))
+
+        self.assertEqual((await self.queue.get(job_id))["status"], "failed")
+        self.assertEqual(len(self.failures), 1)
+
+    async def test_lease_is_renewed_while_the_handler_runs(self):
+        self.queue.lease_seconds = 0.3
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def handler(job, set_stage):
+            started.set()
+            await release.wait()
+
+        job_id = await self.queue.enqueue("case", {})
+        pool = self.make_pool(handler)
+        job = await self.queue.claim(pool.max_attempts)
+        run = asyncio.create_task(pool.run_job(job))
+        await started.wait()
+        # Run past the initial lease without a stage change
+        await asyncio.sleep(0.6)
+        self.assertIsNone(await self.queue.claim(pool.max_attempts))
+
+        release.set()
+        await run
+        self.assertEqual((await self.queue.get(job_id))["status"], "completed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+# Service modules need the project dependencies, installed with `poetry install`
+pytest.importorskip("inheir_backend.config")
+
+from azure.core.exceptions import HttpResponseError
+
+from inheir_backend.services import search_index
+from inheir_backend.services.search_index import batch_documents, upload_batch
+
+
+def make_documents(count: int, content: str = "text") -> list:
+    return [{"id": f"doc-{idx}", "content": content} for idx in range(count)]
+
+
+def make_error(status_code: int) -> HttpResponseError:
+    error = HttpResponseError(message=f"Status {status_code}")
+    error.status_code = status_code
+    return error
+
+
+def indexing_result(key: str, status_code: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        key=key,
+        succeeded=status_code in (200, 201),
+        status_code=status_code,
+        error_message=None if status_code in (200, 201) else f"Status {status_code}"
+    )
+
+
+class BatchDocumentsTest(unittest.TestCase):
+    def test_batches_respect_the_document_count(self):
+        batches = list(batch_documents(make_documents(25), max_count=10, max_bytes=10 ** 6))
+
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+        self.assertEqual([document for batch in batches for document in batch], make_documents(25))
+
+    def test_batches_respect_the_payload_size(self):
+        documents = make_documents(6, content="x" * 100)
+        size = len(json.dumps(documents[0]).encode("utf-8"))
+        batches = list(batch_documents(documents, max_count=100, max_bytes=size * 2 + 1))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2])
+
+    def test_oversized_document_gets_its_own_batch(self):
+        documents = [*make_documents(1), {"id": "large", "content": "x" * 1000}, *make_documents(1)]
+        batches = list(batch_documents(documents, max_count=100, max_bytes=200))
+
+        self.assertEqual([[document["id"] for document in batch] for batch in batches], [["doc-0"], ["large"], ["doc-0"]])
+
+    def test_no_documents_no_batches(self):
+        self.assertEqual(list(batch_documents([], max_count=10, max_bytes=100)), [])
+
+
+class UploadBatchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = []
+        self.responses = []
+        search = mock.Mock()
+        search.merge_or_upload_documents = self.merge_or_upload_documents
+        patches = [
+            mock.patch.object(search_index.config, "search", search),
+            mock.patch.object(search_index.config.env, "kb_search_upload_retries", 2),
+            mock.patch.object(search_index.asyncio, "sleep", mock.AsyncMock())
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def merge_or_upload_documents(self, documents):
+        self.calls.append([document["id"] for document in documents])
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return [indexing_result(document["id"], response(document)) for document in documents]
+
+    async def test_successful_batch_has_no_failures(self):
+        self.responses = [lambda document: 200]
+
+        self.assertEqual(await upload_batch(make_documents(3)), {})
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_only_transiently_failed_documents_are_retried(self):
+        self.responses = [
+            lambda document: 503 if document["id"] == "doc-1" else 200,
+            lambda document: 200
+        ]
+
+        self.assertEqual(await upload_batch(make_documents(3)), {})
+        self.assertEqual(self.calls, [["doc-0", "doc-1", "doc-2"], ["doc-1"]])
+
+    async def test_permanent_document_failure_is_reported_without_retry(self):
+        self.responses = [lambda document: 400 if document["id"] == "doc-2" else 200]
+
+        self.assertEqual(await upload_batch(make_documents(3)), {"doc-2": "Status 400"})
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_retries_stop_after_the_configured_attempts(self):
+        self.responses = [lambda document: 429] * 3
+
+        failures = await upload_batch(make_documents(2))
+
+        self.assertEqual(set(failures), {"doc-0", "doc-1"})
+        self.assertEqual(len(self.calls), 3)
+
+    async def test_transient_batch_error_retries_the_whole_batch(self):
+        self.responses = [make_error(503), lambda document: 200]
+
+        self.assertEqual(await upload_batch(make_documents(2)), {})
+        self.assertEqual(self.calls, [["doc-0", "doc-1"], ["doc-0", "doc-1"]])
+
+    async def test_permanent_batch_error_fails_every_document(self):
+        self.responses = [make_error(403)]
+
+        failures = await upload_batch(make_documents(2))
+
+        self.assertEqual(set(failures), {"doc-0", "doc-1"})
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_batch_too_large_is_split_in_half(self):
+        self.responses = [make_error(413), lambda document: 200, lambda document: 200]
+
+        self.assertEqual(await upload_batch(make_documents(4)), {})
+        self.assertEqual(self.calls, [
+            ["doc-0", "doc-1", "doc-2", "doc-3"],
+            ["doc-0", "doc-1"],
+            ["doc-2", "doc-3"]
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()